@@ -0,0 +1,39 @@
+"""added unique car dedup key
+
+Revision ID: 5b8f0d3c1e72
+Revises: 9c41e7a2b5d3
+Create Date: 2026-10-18 19:02:47.301945
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8f0d3c1e72'
+down_revision: Union[str, Sequence[str], None] = '9c41e7a2b5d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Drop existing duplicates first, keeping the oldest row of each key, in
+    # one sort instead of a self-join (PARTITION BY groups NULLs together,
+    # like the NULLS NOT DISTINCT index below).
+    # Their vectors are cleaned up by the next incremental embedding sync.
+    op.execute(
+        "DELETE FROM cars WHERE id IN ("
+        "SELECT id FROM ("
+        "SELECT id, ROW_NUMBER() OVER (PARTITION BY title, mileage_km, year ORDER BY id) AS rn FROM cars"
+        ") t WHERE rn > 1)"
+    )
+    op.create_index('uq_cars_title_mileage_year', 'cars', ['title', 'mileage_km', 'year'],
+                    unique=True, postgresql_nulls_not_distinct=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_cars_title_mileage_year', table_name='cars')
@@ -0,0 +1,43 @@
+"""added car listing indexes
+
+Revision ID: 7e2a9d4c6b10
+Revises: 5b8f0d3c1e72
+Create Date: 2026-10-18 19:48:05.114870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2a9d4c6b10'
+down_revision: Union[str, Sequence[str], None] = '5b8f0d3c1e72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # (sort column, id) for keyset pagination of GET /cars; each index also
+    # serves the descending sort with a backward scan
+    op.create_index('ix_cars_price_num_id', 'cars', ['price_num', 'id'])
+    op.create_index('ix_cars_year_id', 'cars', ['year', 'id'])
+    op.create_index('ix_cars_mileage_km_id', 'cars', ['mileage_km', 'id'])
+    op.create_index('ix_cars_date_posted_id', 'cars', ['date_posted', 'id'])
+    # Filters compare lower(...) (app.filters.filter_conditions), so the most
+    # common ones get expression indexes ending in the default price sort key
+    op.create_index('ix_cars_make_model_price_id', 'cars',
+                    [sa.text('lower(make)'), sa.text('lower(model)'), 'price_num', 'id'])
+    op.create_index('ix_cars_city_price_id', 'cars', [sa.text('lower(city)'), 'price_num', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cars_city_price_id', table_name='cars')
+    op.drop_index('ix_cars_make_model_price_id', table_name='cars')
+    op.drop_index('ix_cars_date_posted_id', table_name='cars')
+    op.drop_index('ix_cars_mileage_km_id', table_name='cars')
+    op.drop_index('ix_cars_year_id', table_name='cars')
+    op.drop_index('ix_cars_price_num_id', table_name='cars')
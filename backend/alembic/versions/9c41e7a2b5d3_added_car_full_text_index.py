@@ -0,0 +1,33 @@
+"""added car full text index
+
+Revision ID: 9c41e7a2b5d3
+Revises: d778361335b6
+Create Date: 2026-10-18 18:40:12.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c41e7a2b5d3'
+down_revision: Union[str, Sequence[str], None] = 'd778361335b6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Must match app.retrieval.car_search_vector() so the planner uses the index;
+    # index expressions must be IMMUTABLE, which concat_ws is not
+    op.execute(
+        "CREATE INDEX ix_cars_search_vector ON cars USING gin "
+        "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(make, '') || ' ' || coalesce(model, '')))"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cars_search_vector', table_name='cars')
@@ -0,0 +1,30 @@
+"""added chat history index
+
+Revision ID: b3f1c9e2d4a7
+Revises: 7e2a9d4c6b10
+Create Date: 2026-10-18 21:02:37.418265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c9e2d4a7'
+down_revision: Union[str, Sequence[str], None] = '7e2a9d4c6b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A user's chats newest first (GET /chat/{user_id}), keyset-paginated on
+    # (timestamp, id); a backward scan serves the descending order
+    op.create_index('ix_chats_user_id_timestamp_id', 'chats', ['user_id', 'timestamp', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_chats_user_id_timestamp_id', table_name='chats')
@@ -0,0 +1,30 @@
+"""added car scraped_at index
+
+Revision ID: c5e8a1f3d902
+Revises: b3f1c9e2d4a7
+Create Date: 2026-10-19 10:14:52.603118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a1f3d902'
+down_revision: Union[str, Sequence[str], None] = 'b3f1c9e2d4a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The incremental embedding sync selects cars scraped since its last run
+    # (app.backfill.sync_embeddings)
+    op.create_index('ix_cars_scraped_at', 'cars', ['scraped_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_cars_scraped_at', table_name='cars')
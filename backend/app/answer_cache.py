@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app.config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES
+
+
+class AnswerCache:
+    """Cache of LLM answers keyed on query embedding similarity.
+
+    An answer is reused when a new query retrieved exactly the same set of
+    cars and its embedding is within `threshold` cosine similarity of the
+    cached query. Entries expire after `ttl` seconds, and the whole cache is
+    dropped when the generation changes, i.e. after any write to the Chroma
+    collection or to car rows.
+    """
+
+    def __init__(self, threshold: float, ttl: int, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (entry id) -> (car id set, normalized query embedding, answer, expires_at)
+        self._entries: OrderedDict[int, tuple] = OrderedDict()
+        self._by_cars: dict[frozenset, list[int]] = {}
+        self._next_id = 0
+        self._generation = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def lookup(self, query_emb, car_ids, generation: str) -> str | None:
+        if not self.enabled:
+            return None
+        key = frozenset(car_ids)
+        query = _normalize(query_emb)
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            for entry_id in self._by_cars.get(key, []):
+                _, emb, answer, expires_at = self._entries[entry_id]
+                if expires_at > now and float(np.dot(emb, query)) >= self.threshold:
+                    self.hits += 1
+                    return answer
+            self.misses += 1
+        return None
+
+    def store(self, query_emb, car_ids, generation: str, answer: str):
+        if not self.enabled:
+            return
+        key = frozenset(car_ids)
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            self._purge_expired(now)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, _normalize(query_emb), answer, now + self.ttl)
+            self._by_cars.setdefault(key, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _purge_expired(self, now: float):
+        # Every entry lives for the same ttl, so they expire in insertion order
+        while self._entries:
+            entry_id = next(iter(self._entries))
+            if self._entries[entry_id][3] > now:
+                break
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int):
+        key = self._entries.pop(entry_id)[0]
+        ids = self._by_cars[key]
+        ids.remove(entry_id)
+        if not ids:
+            del self._by_cars[key]
+
+    def _check_generation(self, generation: str):
+        if generation != self._generation:
+            self._entries.clear()
+            self._by_cars.clear()
+            self._generation = generation
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _normalize(vector) -> np.ndarray:
+    arr = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(arr)
+    return arr / norm if norm else arr
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_MAX_ENTRIES)
@@ -1,9 +1,168 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app import metrics
+from app.config import (
+    BCRYPT_ROUNDS, AUTH_WORKERS, AUTH_WORKER_NICE, AUTH_MAX_PENDING, LOGIN_RATE_LIMIT, LOGIN_RATE_WINDOW,
+)
+
+# Hashes with other costs still verify; verify_and_update flags them for rehashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str):
     return pwd_context.hash(password)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """Verify, and return a new hash too if the stored one uses an outdated cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class AuthBusy(Exception):
+    """The auth pool cannot take a hash now: AUTH_MAX_PENDING are queued, or its workers keep dying."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+
+def _lower_priority():
+    # Hashing yields the CPU to the API process when both want it
+    os.nice(AUTH_WORKER_NICE)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: forking the API process would copy its threads and open connections
+                _pool = ProcessPoolExecutor(max_workers=AUTH_WORKERS, initializer=_lower_priority,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def _replace_broken_pool(broken: ProcessPoolExecutor):
+    """Drop a pool whose worker died (OOM kill, segfault), so the next call starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not broken:
+            return  # another call already replaced it
+        _pool = None
+    print("An auth worker process died; restarting the auth pool")
+    metrics.counter("auth_pool_restarts_total", "Auth pools replaced after a worker died").inc()
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def start_auth_pool():
+    """Start the worker processes now, so the first login does not wait for them."""
+    pool = _get_pool()
+    for _ in range(AUTH_WORKERS):
+        pool.submit(time.sleep, 0)
+
+
+def shutdown_auth_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+async def _run(operation: str, fn, *args):
+    """Run a bcrypt call in the auth pool, keeping the CPU work off the API's threads and GIL.
+
+    Raises AuthBusy instead of queueing more than AUTH_MAX_PENDING calls. A
+    pool broken by a dead worker is replaced and the call retried once; if
+    the new pool breaks too, AuthBusy is raised as well.
+    """
+    global _pending
+    if _pending >= AUTH_MAX_PENDING:
+        metrics.counter("auth_rejected_total", "Rejected register/login attempts", reason="busy").inc()
+        raise AuthBusy()
+    _pending += 1
+    started = time.perf_counter()
+    try:
+        for _ in range(2):
+            pool = _get_pool()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                _replace_broken_pool(pool)
+        metrics.counter("auth_rejected_total", "Rejected register/login attempts", reason="pool_broken").inc()
+        raise AuthBusy()
+    finally:
+        _pending -= 1
+        metrics.timer("auth_hash_seconds", "Password hash/verify time, including the queue",
+                      operation=operation).observe(time.perf_counter() - started)
+
+
+async def ahash_password(password: str) -> str:
+    return await _run("hash", hash_password, password)
+
+
+async def averify_password(plain_password, hashed_password) -> tuple[bool, str | None]:
+    """Async verify_and_update, run in the auth pool."""
+    return await _run("verify", verify_and_update, plain_password, hashed_password)
+
+
+class LoginRateLimiter:
+    """Sliding-window limit on login attempts per username.
+
+    Counts every attempt, successful or not, so a burst against one account
+    cannot keep the auth pool busy. State is per process. Usernames are kept
+    in order of their last attempt, so the ones idle past the window are
+    dropped from the front as they expire, at O(1) amortized cost per
+    attempt. Live entries are never evicted, since that would reset their
+    limit: while `max_usernames` are being tracked, attempts for any other
+    username are rejected until the oldest one expires.
+    """
+
+    def __init__(self, limit: int, window: float, max_usernames: int = 100_000):
+        self.limit = limit
+        self.window = window
+        self.max_usernames = max_usernames
+        self._lock = threading.Lock()
+        self._attempts: OrderedDict[str, deque] = OrderedDict()
+
+    def hit(self, username: str) -> float:
+        """Record an attempt; returns 0 if it is allowed, else the seconds until the next one is."""
+        if self.limit <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if username not in self._attempts and len(self._attempts) >= self.max_usernames:
+                metrics.counter("auth_rejected_total", "Rejected register/login attempts", reason="rate_limited").inc()
+                oldest = next(iter(self._attempts.values()), None)
+                return oldest[-1] + self.window - now if oldest else self.window
+            attempts = self._attempts.setdefault(username, deque())
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.limit:
+                metrics.counter("auth_rejected_total", "Rejected register/login attempts", reason="rate_limited").inc()
+                return attempts[0] + self.window - now
+            attempts.append(now)
+            self._attempts.move_to_end(username)
+            return 0.0
+
+    def _expire(self, now: float):
+        while self._attempts:
+            oldest, attempts = next(iter(self._attempts.items()))
+            if attempts and attempts[-1] > now - self.window:
+                break
+            del self._attempts[oldest]
+
+
+login_limiter = LoginRateLimiter(LOGIN_RATE_LIMIT, LOGIN_RATE_WINDOW)
@@ -1,10 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
 from app.models import Car
-from app.chroma_client import collection
-from app.ollama_utils import get_embedding
+from app.chroma_client import get_collection, bump_generation
+from app.config import CHROMA_PATH, EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from app.ollama_utils import get_embedding, get_embeddings
+from app.telemetry import span
+import hashlib
+import json
+import os
 import time
 
 BATCH_SIZE = 500  # process 500 cars at a time to save memory
+ID_PAGE_SIZE = 10_000  # ids per Chroma get when looking for deleted cars
+WATERMARK_FILE = os.path.join(CHROMA_PATH, ".sync_watermark")
+# Rows committed by a transaction that started before the last sync can carry
+# an older scraped_at than the watermark; re-checking this much is cheap,
+# since unchanged cars are skipped by their content hash
+WATERMARK_OVERLAP = timedelta(minutes=10)
 
 def sanitize_metadata(metadata: dict):
     sanitized = {}
@@ -21,61 +35,231 @@ def sanitize_metadata(metadata: dict):
     return sanitized
 
 
-def backfill_embeddings(db: Session):
-    offset = 0
+def car_document(car: Car) -> str:
+    return f"{car.title}. Make: {car.make}, Model: {car.model}, Year: {car.year}, Mileage: {car.mileage_km} km, City: {car.city}, Price: {car.price_num}."
+
+
+def car_metadata(car: Car) -> dict:
+    # Sanitize the metadata dictionary for the current car
+    return sanitize_metadata({
+        "id": car.id,
+        "title": car.title,
+        "make": car.make,
+        "model": car.model,
+        "city": car.city,
+        "municipality": car.municipality,
+        "year": car.year,
+        "price_num": float(car.price_num) if car.price_num else None,
+        "mileage_km": car.mileage_km,
+        "date_posted": car.date_posted.strftime("%d.%m.%Y") if car.date_posted else None,
+        "url": car.url,
+        "image_url": car.image_url
+    })
+
+
+def content_hash(document: str, metadata: dict) -> str:
+    """Fingerprint of what we store for a car, used to skip unchanged rows."""
+    payload = json.dumps(metadata, sort_keys=True, default=str)
+    return hashlib.sha256(f"{document}\n{payload}".encode("utf-8")).hexdigest()
+
+
+def car_item(car: Car) -> tuple[str, str, dict]:
+    document = car_document(car)
+    metadata = car_metadata(car)
+    metadata["content_hash"] = content_hash(document, metadata)
+    return str(car.id), document, metadata
+
+
+def iter_car_pages(db: Session, page_size: int = BATCH_SIZE, *criteria):
+    """Yield pages of cars (matching `criteria`, if any) ordered by id using keyset pagination.
+
+    Unlike OFFSET paging, every page is a range scan on the primary key, so
+    deep pages cost the same as the first one.
+    """
+    last_id = 0
     while True:
-        cars = db.query(Car).offset(offset).limit(BATCH_SIZE).all()
+        cars = db.query(Car).filter(Car.id > last_id, *criteria).order_by(Car.id).limit(page_size).all()
         if not cars:
             break
+        yield cars
+        last_id = cars[-1].id
 
-        embeddings_to_add = []
-        ids_to_add = []
-        metadatas_to_add = []
-        documents_to_add = []
-
-        for car in cars:
-            text_to_embed = f"{car.title}. Make: {car.make}, Model: {car.model}, Year: {car.year}, Mileage: {car.mileage_km} km, City: {car.city}, Price: {car.price_num}."
-
-            try:
-                embedding = get_embedding(text_to_embed)
-            except Exception as e:
-                print(f"Failed to embed car {car.id}: {e}")
-                continue
-
-            ids_to_add.append(str(car.id))
-            embeddings_to_add.append(embedding)
-            # Sanitize the metadata dictionary for the current car
-            car_metadata = {
-                "id": car.id,
-                "title": car.title,
-                "make": car.make,
-                "model": car.model,
-                "city": car.city,
-                "municipality": car.municipality,
-                "year": car.year,
-                "price_num": float(car.price_num) if car.price_num else None,
-                "mileage_km": car.mileage_km,
-                "date_posted": car.date_posted.strftime("%d.%m.%Y") if car.date_posted else None,
-                "url": car.url,
-                "image_url": car.image_url
-            }
-            sanitized_car_metadata = sanitize_metadata(car_metadata)
-            metadatas_to_add.append(sanitized_car_metadata)
-            documents_to_add.append(text_to_embed)
 
-        # Add batch to Chroma
-        if embeddings_to_add:
-            collection.add(
-                ids=ids_to_add,
-                embeddings=embeddings_to_add,
-                metadatas=metadatas_to_add,
-                documents=documents_to_add
-            )
-            print(f"Added {len(embeddings_to_add)} embeddings to ChromaDB")
+def _embed_batch(batch: list[tuple[str, str, dict]]):
+    """Embed one batch of (id, document, metadata) with a single `embed` call.
+
+    If the batch call fails, fall back to embedding documents one by one so a
+    single bad document does not drop the whole batch.
+    """
+    documents = [doc for _, doc, _ in batch]
+    try:
+        with span("backfill_embed", batch_size=len(batch)):
+            return batch, get_embeddings(documents)
+    except Exception as e:
+        print(f"Batch of {len(batch)} failed, retrying one by one: {e}")
+
+    embedded, embeddings = [], []
+    for item in batch:
+        try:
+            embeddings.append(get_embedding(item[1]))
+            embedded.append(item)
+        except Exception as e:
+            print(f"Failed to embed car {item[0]}: {e}")
+    return embedded, embeddings
+
+
+def _store_batch(batch, embeddings) -> int:
+    if not embeddings:
+        return 0
+    with span("backfill_upsert", batch_size=len(batch)):
+        get_collection().upsert(
+            ids=[car_id for car_id, _, _ in batch],
+            embeddings=embeddings,
+            metadatas=[meta for _, _, meta in batch],
+            documents=[doc for _, doc, _ in batch]
+        )
+    bump_generation()
+    return len(embeddings)
+
+
+def embed_items(items: list[tuple[str, str, dict]]) -> int:
+    """Embed and store a small batch of (id, document, metadata) items inline."""
+    return _store_batch(*_embed_batch(items))
+
+
+def embed_pages(pages, batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY) -> int:
+    """Embed and store pages of (id, document, metadata) items.
+
+    Items are sent to Ollama `batch_size` documents per `embed` call, with at
+    most `concurrency` calls in flight. Pulling the next page waits until a
+    slot frees up, so memory stays bounded by the number of batches in flight
+    rather than by the size of the table.
+    """
+    started = time.perf_counter()
+    total_embedded = 0
+    pending = set()
+
+    def drain(futures):
+        nonlocal total_embedded
+        for future in futures:
+            batch, embeddings = future.result()
+            total_embedded += _store_batch(batch, embeddings)
 
-        print(f"Processed batch {offset} to {offset + len(cars)}")
-        offset += BATCH_SIZE
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for page_no, items in enumerate(pages):
+            for start in range(0, len(items), batch_size):
+                # Backpressure: wait for a slot before submitting another batch
+                while len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    drain(done)
+                pending.add(pool.submit(_embed_batch, items[start:start + batch_size]))
 
-        time.sleep(0.5)
+            elapsed = time.perf_counter() - started
+            print(f"Processed page {page_no} ({len(items)} queued, {total_embedded} embedded, "
+                  f"{total_embedded / elapsed:.1f} docs/sec)")
 
+        drain(pending)
+
+    elapsed = time.perf_counter() - started
+    rate = total_embedded / elapsed if elapsed else 0.0
+    print(f"Embedded {total_embedded} cars in {elapsed:.1f}s ({rate:.1f} docs/sec)")
+    return total_embedded
+
+
+def _current_watermark(db: Session) -> dict:
+    """Newest scraped_at and highest id in `cars`, taken before a sync reads any car."""
+    scraped_at, max_id = db.execute(select(func.max(Car.scraped_at), func.max(Car.id))).one()
+    return {"scraped_at": scraped_at.isoformat() if scraped_at else None, "max_id": max_id or 0}
+
+
+def read_watermark() -> dict | None:
+    """Where the last sync or backfill left off, or None if there was none."""
+    try:
+        with open(WATERMARK_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_watermark(watermark: dict):
+    os.makedirs(os.path.dirname(WATERMARK_FILE), exist_ok=True)
+    with open(WATERMARK_FILE, "w") as f:
+        json.dump(watermark, f)
+
+
+def backfill_embeddings(db: Session, batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY):
+    """Embed every car and write it to ChromaDB."""
+    watermark = _current_watermark(db)
+    pages = ([car_item(car) for car in cars] for cars in iter_car_pages(db))
+    total = embed_pages(pages, batch_size=batch_size, concurrency=concurrency)
+    write_watermark(watermark)
     print("Backfill complete!")
+    return total
+
+
+def _changed_since(watermark: dict | None) -> list:
+    """Criteria selecting the cars added or re-scraped since `watermark` (none: every car)."""
+    if watermark is None:
+        return []
+    changed = [Car.id > watermark["max_id"]]
+    if watermark["scraped_at"]:
+        since = datetime.fromisoformat(watermark["scraped_at"]) - WATERMARK_OVERLAP
+        changed.append(Car.scraped_at > since)
+    return [or_(*changed)]
+
+
+def _deleted_ids(db: Session) -> list[str]:
+    """Ids in Chroma whose car is gone, found by diffing ids only."""
+    live = {str(car_id) for car_id in db.scalars(select(Car.id))}
+    collection = get_collection()
+    stale = []
+    for offset in range(0, collection.count(), ID_PAGE_SIZE):
+        ids = collection.get(include=[], limit=ID_PAGE_SIZE, offset=offset)["ids"]
+        stale.extend(car_id for car_id in ids if car_id not in live)
+    return stale
+
+
+def sync_embeddings(db: Session, batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY,
+                    rescan: bool = False):
+    """Incrementally bring ChromaDB in line with the `cars` table.
+
+    Only cars added or re-scraped since the last sync (by id and scraped_at,
+    kept in a watermark file next to the collection) are loaded. Each one's
+    content hash is compared with the one stored in its Chroma metadata,
+    and only new or changed cars are embedded. Vectors whose car no longer
+    exists are found by diffing the ids in Postgres and Chroma, without
+    loading the cars. The first run, or one with `rescan`, compares every
+    car.
+    """
+    stats = {"new": 0, "changed": 0, "unchanged": 0, "deleted": 0}
+    watermark = _current_watermark(db)
+    since = None if rescan else read_watermark()
+
+    def delta_pages():
+        for cars in iter_car_pages(db, BATCH_SIZE, *_changed_since(since)):
+            items = [car_item(car) for car in cars]
+            existing = get_collection().get(ids=[car_id for car_id, _, _ in items], include=["metadatas"])
+            stored = {
+                car_id: (meta or {}).get("content_hash")
+                for car_id, meta in zip(existing["ids"], existing["metadatas"])
+            }
+            delta = []
+            for item in items:
+                stored_hash = stored.get(item[0])
+                if stored_hash == item[2]["content_hash"]:
+                    stats["unchanged"] += 1
+                    continue
+                stats["changed" if item[0] in stored else "new"] += 1
+                delta.append(item)
+            yield delta
+
+    embed_pages(delta_pages(), batch_size=batch_size, concurrency=concurrency)
+    stale = _deleted_ids(db)
+    if stale:
+        get_collection().delete(ids=stale)
+        bump_generation()
+        stats["deleted"] = len(stale)
+    write_watermark(watermark)
+    print(f"Sync complete! {stats['new']} new, {stats['changed']} changed, "
+          f"{stats['unchanged']} unchanged, {stats['deleted']} deleted")
+    return stats
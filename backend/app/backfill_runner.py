@@ -1,9 +1,34 @@
-from app.main import get_db
-from app.backfill import backfill_embeddings
+import argparse
+from app.db.session import SessionLocal
+from app.backfill import backfill_embeddings, sync_embeddings
+from app.config import EMBED_BATCH_SIZE, EMBED_CONCURRENCY
+from app.telemetry import setup_tracing
+from app import metrics
 
 def main():
-    db = next(get_db())
-    backfill_embeddings(db)
+    parser = argparse.ArgumentParser(description="Embed cars from Postgres into ChromaDB")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE,
+                        help="documents per Ollama embed call")
+    parser.add_argument("--concurrency", type=int, default=EMBED_CONCURRENCY,
+                        help="embed calls in flight at once")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only embed new/changed cars and drop vectors of deleted ones")
+    parser.add_argument("--rescan", action="store_true",
+                        help="with --incremental, compare every car, not just those scraped since the last sync")
+    args = parser.parse_args()
+
+    setup_tracing()
+    db = SessionLocal()
+    try:
+        if args.incremental:
+            sync_embeddings(db, batch_size=args.batch_size, concurrency=args.concurrency, rescan=args.rescan)
+        else:
+            backfill_embeddings(db, batch_size=args.batch_size, concurrency=args.concurrency)
+    finally:
+        db.close()
+
+    for stage, stats in metrics.snapshot("stage_seconds").items():
+        print(f"{stage}: {stats['count']} calls, mean {stats['mean'] * 1000:.0f} ms, max {stats['max'] * 1000:.0f} ms")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,79 @@
+import threading
+
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import CAR_CACHE_TTL, CAR_CACHE_MAX_ENTRIES
+from app.models import Car
+from app.schemas import CarOut
+
+
+class CarCache:
+    """Small id-keyed LRU of `CarOut` records with a TTL.
+
+    The TTL bounds how stale a cached car can be after the ingest updates
+    it; least recently used entries go first once `max_entries` is reached.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cars = TTLCache(maxsize=max_entries, ttl=ttl) if ttl > 0 else None
+
+    def get_many(self, ids: list[int]) -> dict[int, CarOut]:
+        if self._cars is None:
+            self.misses += len(ids)
+            return {}
+        found = {}
+        with self._lock:
+            for car_id in ids:
+                car = self._cars.get(car_id)
+                if car is not None:
+                    found[car_id] = car
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    def put_many(self, cars: list[CarOut]):
+        if self._cars is None:
+            return
+        with self._lock:
+            for car in cars:
+                self._cars[car.id] = car
+
+    def clear(self):
+        if self._cars is not None:
+            with self._lock:
+                self._cars.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._cars) if self._cars is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+car_cache = CarCache(CAR_CACHE_TTL, CAR_CACHE_MAX_ENTRIES)
+
+
+async def get_cars(db: AsyncSession, ids: list[int]) -> list[CarOut]:
+    """Fetch cars by id, in the order of `ids`, skipping ids that do not exist.
+
+    Cached cars are served from memory and all others are loaded with a
+    single `IN` query, so hydrating a page of hits costs one round trip.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = car_cache.get_many(ids)
+    missing = [car_id for car_id in ids if car_id not in found]
+    if missing:
+        rows = (await db.execute(select(Car).where(Car.id.in_(missing)))).scalars().all()
+        loaded = [CarOut.model_validate(car) for car in rows]
+        car_cache.put_many(loaded)
+        found.update((car.id, car) for car in loaded)
+    return [found[car_id] for car_id in ids if car_id in found]
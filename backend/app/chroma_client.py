@@ -1,16 +1,61 @@
-import chromadb
+import os
+import threading
+import time
 
-from chromadb.config import Settings
+from app.config import CHROMA_PATH
 
-client = chromadb.PersistentClient(
-    path="/app/chroma_db"
-)
+COLLECTION_NAME = "cars_embeddings"
+GENERATION_FILE = os.path.join(CHROMA_PATH, ".generation")
 
-collection = client.get_or_create_collection(
-    "cars_embeddings",
-    metadata={"hnsw:space": "cosine"}
-)
+_collection = None
+_lock = threading.Lock()
 
-docs = collection.get()
-nums_docs = len(docs['ids'])  # Count of documents
-print(f"Number of documents in ChromaDB: {nums_docs}")
\ No newline at end of file
+
+def get_collection():
+    """The cars collection, opened on first use.
+
+    Importing this module stays cheap: chromadb itself is only imported, and
+    the persistent client only opened, when something first needs the
+    collection.
+    """
+    global _collection
+    if _collection is None:
+        with _lock:
+            if _collection is None:
+                import chromadb
+
+                client = chromadb.PersistentClient(path=CHROMA_PATH)
+                _collection = client.get_or_create_collection(
+                    COLLECTION_NAME,
+                    metadata={"hnsw:space": "cosine"}
+                )
+    return _collection
+
+
+def bump_generation():
+    """Mark the search data as changed.
+
+    Called after every write to the collection, and after car rows are
+    upserted, since search hits are hydrated from Postgres. A failure here
+    only leaves cached answers around until their TTL, so it is logged
+    rather than raised into the write that already succeeded.
+    """
+    try:
+        os.makedirs(CHROMA_PATH, exist_ok=True)
+        with open(GENERATION_FILE, "w") as f:
+            f.write(str(time.time_ns()))
+    except OSError as e:
+        print("Could not bump the search generation:", e)
+
+
+def collection_generation() -> str:
+    """Opaque token that changes whenever the collection or the cars are written to.
+
+    Stored in a file next to the collection so writes from other processes
+    (e.g. the backfill runner) are seen by the API as well.
+    """
+    try:
+        with open(GENERATION_FILE) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "0"
@@ -6,9 +6,68 @@ POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
-POSTGRES_PORT = int(os.getenv("POSTGRES_PORT"))
+POSTGRES_PORT = int(os.getenv("POSTGRES_PORT") or "5432")
 
-DATABASE_URL = (
-    f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
+# One URL for every engine; app.db.session picks the driver (psycopg2 or asyncpg)
+DATABASE_URL = os.getenv("DATABASE_URL") or (
+    f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}"
     f"@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 )
+
+# Connection pool settings, per engine (the API and scripts each get their own)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 disables it
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+# Persistent ChromaDB directory (a volume in docker-compose)
+CHROMA_PATH = os.getenv("CHROMA_PATH", "/app/chroma_db")
+
+# Embedding backfill tuning
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+
+# On-disk embedding cache shared by /search and the backfill (empty path disables it)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "/app/data/embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+
+# Semantic answer cache for /search (a TTL of 0 disables it)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "600"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+
+# Cache-Control max-age (seconds) for the /cars listing endpoints
+CARS_CACHE_MAX_AGE = int(os.getenv("CARS_CACHE_MAX_AGE", "60"))
+
+# In-process cache of car records used to hydrate search hits (a TTL of 0 disables it)
+CAR_CACHE_TTL = int(os.getenv("CAR_CACHE_TTL", "60"))
+CAR_CACHE_MAX_ENTRIES = int(os.getenv("CAR_CACHE_MAX_ENTRIES", "5000"))
+
+# Optional reranking of search hits before prompt building: "" (off), "features" or "onnx"
+RERANKER = os.getenv("RERANKER", "")
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "30"))  # most a query may spend reranking
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))  # hits reranked before taking top_k
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_ONNX_MODEL = os.getenv("RERANK_ONNX_MODEL", "/app/models/reranker")  # model.onnx + tokenizer.json
+
+# LLM prompt context: "compact" (table rows with short refs, within a token budget) or "full"
+PROMPT_CONTEXT = os.getenv("PROMPT_CONTEXT", "compact")
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))  # whole prompt, in tokens
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")  # tiktoken encoding or tokenizer.json path
+
+# Password hashing runs in its own process pool, off the API's threads
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # cost factor; each +1 doubles the time
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", "2"))  # processes hashing/verifying passwords
+AUTH_WORKER_NICE = int(os.getenv("AUTH_WORKER_NICE", "10"))  # lower CPU priority than the API
+AUTH_MAX_PENDING = int(os.getenv("AUTH_MAX_PENDING", "64"))  # queued hashes before answering 503
+
+# Login attempts allowed per username within the window (a limit of 0 disables it)
+LOGIN_RATE_LIMIT = int(os.getenv("LOGIN_RATE_LIMIT", "10"))
+LOGIN_RATE_WINDOW = int(os.getenv("LOGIN_RATE_WINDOW", "60"))  # seconds
+
+# OpenTelemetry: spans are exported over OTLP only when an endpoint is set
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "")
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "collector-api")
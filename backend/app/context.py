@@ -0,0 +1,133 @@
+import math
+import re
+
+from app.config import CONTEXT_TOKEN_BUDGET, CONTEXT_TOKENIZER, PROMPT_CONTEXT
+
+TITLE_CHARS = 48
+_REF = re.compile(r"\[(\d+)\]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough BPE token count for when no tokenizer is available: about 4 characters per token."""
+    return sum(math.ceil(len(piece) / 4) for piece in re.findall(r"\w+|[^\w\s]", text))
+
+
+_count_tokens = None
+
+
+def load_tokenizer():
+    """Load CONTEXT_TOKENIZER; until this has run, prompts are measured with estimate_tokens.
+
+    CONTEXT_TOKENIZER is a tokenizer.json path (e.g. the one shipped with the
+    LLM) or a tiktoken encoding name. Loading may need the network (tiktoken
+    fetches its encoding once), so the API runs it in a background thread.
+    """
+    global _count_tokens
+    _count_tokens = _load_counter(CONTEXT_TOKENIZER)
+
+
+def get_token_counter():
+    return _count_tokens or estimate_tokens
+
+
+def _load_counter(name: str):
+    if not name:
+        return estimate_tokens
+    try:
+        if name.endswith(".json"):
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(name)
+            return lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(name)
+        return lambda text: len(encoding.encode(text))
+    except Exception as e:
+        print(f"Could not load tokenizer {name!r}, estimating prompt tokens instead: {e}")
+        return estimate_tokens
+
+
+def _value(value) -> str:
+    if value is None or value == "" or value == "N/A":
+        return "-"
+    return f"{value:.0f}" if isinstance(value, float) else str(value)
+
+
+def _header(query_text: str) -> str:
+    return (
+        f"The user asked: '{query_text}'\n"
+        f"These are the cars we found, one per line (use only this data, do NOT make up prices or mileage):\n"
+        f"ref|title|price €|km|year|posted\n"
+    )
+
+
+FOOTER = (
+    "Answer concisely in English. Refer to cars by their ref in brackets, e.g. [1]. "
+    "Provide a short summary of the best car."
+)
+
+
+def compact_context(query_text: str, items, token_budget: int = CONTEXT_TOKEN_BUDGET,
+                    count_tokens=None) -> tuple[str, dict[str, str]]:
+    """Prompt with one short pipe-separated row per car, and the ref -> URL map.
+
+    Rows carry a numeric ref instead of the URL and only the fields the
+    answer is about. Rows are added in ranking order while the whole prompt
+    stays within `token_budget` tokens; the first row is always kept.
+    """
+    count_tokens = count_tokens or get_token_counter()
+    header = _header(query_text)
+    used = count_tokens(header) + count_tokens(FOOTER)
+    rows, refs = [], {}
+    for i, item in enumerate(items, start=1):
+        meta = item[2]
+        title = (meta.get("title") or "").replace("|", "/")[:TITLE_CHARS]
+        row = (f"[{i}]|{title}|{_value(meta.get('price_num'))}|{_value(meta.get('mileage_km'))}|"
+               f"{_value(meta.get('year'))}|{_value(meta.get('date_posted'))}\n")
+        cost = count_tokens(row)
+        if rows and used + cost > token_budget:
+            break
+        rows.append(row)
+        used += cost
+        refs[str(i)] = meta.get("url") or ""
+    return header + "".join(rows) + FOOTER, refs
+
+
+def full_context(query_text: str, items) -> tuple[str, dict[str, str]]:
+    """The original prompt: every listing line in full, URLs included, with no ref map."""
+    structured_listings = "\n".join(
+        f"{i+1}. {item[2].get('title','N/A')} | {item[2].get('price_num','N/A')} € | "
+        f"{item[2].get('mileage_km','N/A')} km | "
+        f"{item[2].get('date_posted', 'N/A')} | "
+        f"{item[2].get('url','')}"
+        for i, item in enumerate(items)
+    )
+
+    # LLM prompt always in English
+    prompt = (
+        f"The user asked: '{query_text}'\n"
+        f"These are the cars we found (use only this data, do NOT make up prices or mileage):\n"
+        f"{structured_listings}\n"
+        f"Answer concisely in English. Provide a short summary of the best car."
+    )
+    return prompt, {}
+
+
+def build_context(query_text: str, items) -> tuple[str, dict[str, str]]:
+    """Prompt for the configured PROMPT_CONTEXT format ("compact" or "full")."""
+    if PROMPT_CONTEXT == "full":
+        return full_context(query_text, items)
+    return compact_context(query_text, items)
+
+
+def link_refs(answer: str, refs: dict[str, str]) -> str:
+    """Turn the [n] refs the model cites into markdown links to the listings."""
+    if not refs:
+        return answer
+
+    def link(match):
+        url = refs.get(match.group(1))
+        return f"[{match.group(1)}]({url})" if url else match.group(0)
+
+    return _REF.sub(link, answer)
@@ -1,10 +1,91 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-import os
-from dotenv import load_dotenv
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from app.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT_MS, DB_ECHO,
+)
+from app.metrics import timer, counter
+import time
 
-load_dotenv()
-DATABASE_URL = f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}@{os.getenv('POSTGRES_HOST')}/{os.getenv('POSTGRES_DB')}"
 
-engine = create_engine(DATABASE_URL, future=True, echo=True)
+def _timed_pool(base, name: str):
+    """`base` pool class that records how long each checkout waits for a connection.
+
+    The wait includes opening a new connection when the pool is allowed to
+    grow, so a rising p99 means the pool (or the database) is the bottleneck.
+    """
+    wait = timer("db_pool_checkout_seconds", "Time to check out a connection from the pool", pool=name)
+    timeouts = counter("db_pool_timeouts_total", "Pool checkouts that timed out", pool=name)
+
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except exc.TimeoutError:
+                timeouts.inc()
+                raise
+            finally:
+                wait.observe(time.perf_counter() - started)
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def make_engine(name: str, *, asynchronous: bool = False, url: str = DATABASE_URL, **overrides):
+    """Create a Postgres engine with the pool settings from app.config.
+
+    `name` labels the pool metrics. Keyword arguments override the defaults
+    (e.g. pool_size=1 for a one-off script). SQLite URLs are accepted too, for
+    local benchmarks (scripts/bench.py); they get the same pool but no
+    statement timeout.
+    """
+    url = make_url(url)
+    sqlite = url.get_backend_name() == "sqlite"
+    if sqlite:
+        driver = "aiosqlite" if asynchronous else "pysqlite"
+    else:
+        driver = "asyncpg" if asynchronous else "psycopg2"
+    url = url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+    connect_args = {}
+    if DB_STATEMENT_TIMEOUT_MS and not sqlite:
+        if asynchronous:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    options = {
+        "echo": DB_ECHO,
+        "poolclass": _timed_pool(AsyncAdaptedQueuePool if asynchronous else QueuePool, name),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+        **overrides,
+    }
+    return (create_async_engine if asynchronous else create_engine)(url, **options)
+
+
+def pool_status(engine) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+
+# Sync engine for scripts and the embedding backfill
+engine = make_engine("sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine for the API request path
+async_engine = make_engine("api", asynchronous=True)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -1,4 +1,4 @@
-from app.chroma_client import collection
-from app.ollama_utils import get_embedding
+from app.chroma_client import get_collection
+from app.ollama_utils import get_embedding, aget_embedding
 
 # Re-exporting for easier imports elsewhere
\ No newline at end of file
@@ -0,0 +1,167 @@
+import re
+
+from sqlalchemy import func
+
+from app.models import Car
+from app.schemas import SearchFilters
+
+# Latin spellings users type -> city names as stored (scraped in Cyrillic)
+CITIES = {
+    "skopje": "Скопје", "bitola": "Битола", "kumanovo": "Куманово", "prilep": "Прилеп",
+    "tetovo": "Тетово", "veles": "Велес", "stip": "Штип", "shtip": "Штип", "ohrid": "Охрид",
+    "gostivar": "Гостивар", "strumica": "Струмица", "kavadarci": "Кавадарци", "kocani": "Кочани",
+    "kicevo": "Кичево", "struga": "Струга", "radovis": "Радовиш", "gevgelija": "Гевгелија",
+    "negotino": "Неготино", "debar": "Дебар", "kriva palanka": "Крива Паланка",
+    "sveti nikole": "Свети Николе", "delcevo": "Делчево", "resen": "Ресен", "vinica": "Виница",
+    "berovo": "Берово", "probistip": "Пробиштип", "valandovo": "Валандово", "kratovo": "Кратово",
+}
+
+MAKES = {
+    "volkswagen": "Volkswagen", "vw": "Volkswagen", "bmw": "BMW", "audi": "Audi",
+    "mercedes": "Mercedes-Benz", "mercedes-benz": "Mercedes-Benz", "opel": "Opel",
+    "renault": "Renault", "peugeot": "Peugeot", "citroen": "Citroen", "ford": "Ford",
+    "fiat": "Fiat", "toyota": "Toyota", "skoda": "Skoda", "seat": "Seat", "hyundai": "Hyundai",
+    "kia": "Kia", "nissan": "Nissan", "mazda": "Mazda", "honda": "Honda", "volvo": "Volvo",
+    "dacia": "Dacia", "chevrolet": "Chevrolet", "mitsubishi": "Mitsubishi", "suzuki": "Suzuki",
+    "alfa romeo": "Alfa Romeo", "land rover": "Land Rover", "jeep": "Jeep", "porsche": "Porsche",
+    "lexus": "Lexus", "subaru": "Subaru", "mini": "Mini",
+}
+
+_NUMBER = r"(\d{1,3}(?:[\s.,]\d{3})+|\d+)\s*(k\b|к\b|илј\.?)?"
+_BELOW = r"(?:under|below|less than|cheaper than|up to|max|до|под|помалку од)"
+_ABOVE = r"(?:over|above|more than|at least|min|над|повеќе од)"
+_CURRENCY = r"(?:€|eur\b|euro?s?\b|евра\b|евр\b|ева\b)"
+_YEAR = r"((?:19|20)\d{2})"
+
+_MILEAGE_MAX = re.compile(rf"{_BELOW}\s*{_NUMBER}\s*(?:km|км)\b")
+_PRICE_MAX = re.compile(rf"{_BELOW}\s*{_NUMBER}\s*{_CURRENCY}?")
+_PRICE_MIN = re.compile(rf"{_ABOVE}\s*{_NUMBER}\s*{_CURRENCY}?")
+_PRICE_RANGE = re.compile(rf"(?:between|од)\s*{_NUMBER}\s*(?:and|-|до)\s*{_NUMBER}\s*{_CURRENCY}")
+_YEAR_RANGE = re.compile(rf"\b{_YEAR}\s*(?:-|to|до)\s*{_YEAR}\b")
+_YEAR_MIN = re.compile(rf"(?:\b(?:after|since|newer than|from|од|после)\s+{_YEAR}\b|\b{_YEAR}\s*\+|\b{_YEAR}\s+(?:or|and) newer)")
+_YEAR_MAX = re.compile(rf"\b(?:before|older than|пред)\s+{_YEAR}\b")
+
+
+def _to_number(digits: str, suffix: str | None) -> float | None:
+    digits = re.sub(r"[\s.,]", "", digits)
+    if not digits:
+        return None
+    value = float(digits)
+    return value * 1000 if suffix else value
+
+
+def _first_group(match, start: int) -> str:
+    return next(g for g in match.groups()[start:] if g)
+
+
+def extract_filters(query: str) -> SearchFilters:
+    """Best-effort extraction of structured filters from free text.
+
+    Handles price/mileage bounds ("under 5000 €", "до 150000 км"), years
+    ("2015+", "after 2012", "2010-2015"), cities (Latin or Cyrillic) and
+    common makes. Matched spans are blanked out so a number is only used once.
+    """
+    text = query.lower()
+    found = {}
+
+    def consume(pattern, handler):
+        nonlocal text
+        match = pattern.search(text)
+        if match:
+            handler(match)
+            text = text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+
+    consume(_MILEAGE_MAX, lambda m: found.update(mileage_max=int(_to_number(m.group(1), m.group(2)))))
+    consume(_YEAR_RANGE, lambda m: found.update(year_min=int(m.group(1)), year_max=int(m.group(2))))
+    consume(_PRICE_RANGE, lambda m: found.update(
+        price_min=_to_number(m.group(1), m.group(2)), price_max=_to_number(m.group(3), m.group(4))))
+    consume(_YEAR_MIN, lambda m: found.update(year_min=int(_first_group(m, 0))))
+    consume(_YEAR_MAX, lambda m: found.update(year_max=int(m.group(1))))
+    consume(_PRICE_MAX, lambda m: found.update(price_max=_to_number(m.group(1), m.group(2))))
+    consume(_PRICE_MIN, lambda m: found.update(price_min=_to_number(m.group(1), m.group(2))))
+
+    for name, city in CITIES.items():
+        if re.search(rf"\b{name}\b", text) or city.lower() in text:
+            found["city"] = city
+            break
+    for name, make in MAKES.items():
+        if re.search(rf"\b{re.escape(name)}\b", text):
+            found["make"] = make
+            break
+
+    return SearchFilters(**found)
+
+
+def merge_filters(explicit: SearchFilters | None, extracted: SearchFilters | None) -> SearchFilters | None:
+    """Explicit filters win over ones extracted from the query text."""
+    if explicit is None:
+        return extracted
+    if extracted is None:
+        return explicit
+    merged = extracted.model_dump(exclude_none=True)
+    merged.update(explicit.model_dump(exclude_none=True))
+    return SearchFilters(**merged)
+
+
+def _text_variants(value: str) -> list[str]:
+    # Chroma string matching is exact, so try the usual spellings
+    return list(dict.fromkeys([value, value.strip(), value.title(), value.upper(), value.lower()]))
+
+
+def build_where(filters: SearchFilters | None) -> dict | None:
+    """Translate filters into a Chroma `where` clause over the car metadata.
+
+    Missing numbers are stored as 0 by the backfill, so bounded price/year
+    filters also exclude 0 (unknown) values.
+    """
+    if filters is None:
+        return None
+    conditions = []
+    if filters.price_min is not None:
+        conditions.append({"price_num": {"$gte": filters.price_min}})
+    if filters.price_max is not None:
+        conditions.append({"price_num": {"$lte": filters.price_max}})
+        conditions.append({"price_num": {"$gt": 0}})
+    if filters.year_min is not None:
+        conditions.append({"year": {"$gte": filters.year_min}})
+    if filters.year_max is not None:
+        conditions.append({"year": {"$lte": filters.year_max}})
+        conditions.append({"year": {"$gt": 0}})
+    if filters.mileage_min is not None:
+        conditions.append({"mileage_km": {"$gte": filters.mileage_min}})
+    if filters.mileage_max is not None:
+        conditions.append({"mileage_km": {"$lte": filters.mileage_max}})
+    for field in ("make", "model", "city"):
+        value = getattr(filters, field)
+        if value:
+            conditions.append({field: {"$in": _text_variants(value)}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def filter_conditions(filters: SearchFilters | None) -> list:
+    """The same filters as SQLAlchemy conditions on `Car`, for Postgres-side retrieval."""
+    if filters is None:
+        return []
+    conditions = []
+    if filters.price_min is not None:
+        conditions.append(Car.price_num >= filters.price_min)
+    if filters.price_max is not None:
+        conditions.append(Car.price_num <= filters.price_max)
+    if filters.year_min is not None:
+        conditions.append(Car.year >= filters.year_min)
+    if filters.year_max is not None:
+        conditions.append(Car.year <= filters.year_max)
+    if filters.mileage_min is not None:
+        conditions.append(Car.mileage_km >= filters.mileage_min)
+    if filters.mileage_max is not None:
+        conditions.append(Car.mileage_km <= filters.mileage_max)
+    for field in ("make", "model", "city"):
+        value = getattr(filters, field)
+        if value:
+            conditions.append(func.lower(getattr(Car, field)) == value.strip().lower())
+    return conditions
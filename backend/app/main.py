@@ -1,16 +1,55 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-# from sqlalchemy import case
-from sqlalchemy.orm import Session
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import TypeAdapter
 from fastapi import HTTPException as HttpException
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal, async_engine, pool_status
+from app import metrics
 from app.models import Car, Chat, User
-from app.schemas import CarOut, SearchResponse, RetrievedCar, UserCreate, ChatCreate, SearchRequest
-from app.auth import hash_password, verify_password
-from .embeddings import collection
-from ollama import Client as Ollama
+from app.schemas import (
+    CarOut, CarBatchRequest, SearchResponse, RetrievedCar, UserCreate, ChatCreate, ChatOut, ChatSummary,
+    SearchRequest, SearchFilters,
+)
+from app.filters import build_where, extract_filters, filter_conditions, merge_filters
+from app.pagination import CAR_SORTS, InvalidCursor, car_page, chat_page
+from app.retrieval import lexical_search, reciprocal_rank_fusion
+from app.backfill import car_metadata
+from app.auth import AuthBusy, ahash_password, averify_password, login_limiter, start_auth_pool, shutdown_auth_pool
+from .embeddings import get_collection, aget_embedding
+from app.embedding_cache import get_embedding_cache
+from app.answer_cache import answer_cache
+from app.car_cache import car_cache, get_cars
+from app.chroma_client import collection_generation
+from app.config import CARS_CACHE_MAX_AGE, RERANK_CANDIDATES
+from app.rerank import get_reranker, rerank
+from app.context import build_context, link_refs, load_tokenizer
+from app.single_flight import SingleFlight, normalize_query
+from app.telemetry import (
+    setup_tracing, request_span, server_timing, span, observe_stage, record_tokens, record_ollama_error,
+)
+from ollama import AsyncClient as Ollama
+import asyncio
+import hashlib
+import json
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_auth_pool()
+    threading.Thread(target=load_tokenizer, daemon=True).start()
+    reranker = get_reranker()
+    if reranker:
+        await asyncio.to_thread(reranker.load)
+    yield
+    shutdown_auth_pool()
 
-app = FastAPI(title="Collector API", version="1.0.0")
+app = FastAPI(title="Collector API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,43 +59,131 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+setup_tracing()
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Record request latency and report the stage timings in a Server-Timing header.
+
+    For streaming responses this measures the time until the response starts.
+    """
+    started = time.perf_counter()
+    with request_span(request.method, request.url.path) as timings:
+        response = await call_next(request)
+    total = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.timer(
+        "http_request_seconds", "HTTP request latency until the response starts",
+        method=request.method, path=route.path if route else "unmatched", status=response.status_code,
+    ).observe(total)
+    response.headers["Server-Timing"] = server_timing(timings, total)
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
+
 ollama_client = Ollama()
 
-def get_db():
-    db = SessionLocal()
-    try:
+# Identical searches in flight at the same time share one embedding, Chroma query and LLM generation
+embedding_flight = SingleFlight("embed")
+vector_search_flight = SingleFlight("vector_search")
+generation_flight = SingleFlight("generate")
+
+LLM_MODEL = "llama3.2:1b"
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 @app.get("/health")
-def health():
+async def health():
     return {"status": "ok"}
 
+def _register_cache_gauges():
+    def embedding_stat(key):
+        return lambda: (get_embedding_cache().stats()[key] if get_embedding_cache() else 0)
+
+    for name, cache in (("answer", answer_cache), ("car", car_cache)):
+        metrics.gauge("cache_hits", lambda cache=cache: cache.hits, "Cache hits since start", cache=name)
+        metrics.gauge("cache_misses", lambda cache=cache: cache.misses, "Cache misses since start", cache=name)
+    metrics.gauge("cache_hits", embedding_stat("hits"), "Cache hits since start", cache="embedding")
+    metrics.gauge("cache_misses", embedding_stat("misses"), "Cache misses since start", cache="embedding")
+    metrics.gauge("db_pool_checked_out", lambda: async_engine.pool.checkedout(),
+                  "Connections currently checked out", pool="api")
+
+_register_cache_gauges()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/cache")
+async def cache_stats():
+    cache = get_embedding_cache()
+    return {
+        "embedding_cache": cache.stats() if cache else None,
+        "answer_cache": answer_cache.stats(),
+        "car_cache": car_cache.stats(),
+    }
+
+@app.get("/stats/collection")
+async def collection_stats():
+    # count() reads the collection size without loading any documents
+    count = await run_in_threadpool(lambda: get_collection().count())
+    return {"count": count, "generation": collection_generation()}
+
+@app.get("/stats/db")
+async def db_stats():
+    return {"pool": pool_status(async_engine), "metrics": metrics.snapshot("db_pool_")}
+
+def _auth_busy():
+    return HttpException(status_code=503, detail="Too many sign-ins in progress, try again shortly",
+                         headers={"Retry-After": "1"})
+
 @app.post("/register")
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
     if db_user:
         raise HttpException(status_code=400, detail="Username already registered")
-    new_user = User(username=user.username, hashed_password=hash_password(user.password))
-    db.add(new_user) 
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()  # release the connection while hashing, as in login
+    try:
+        hashed_password = await ahash_password(user.password)
+    except AuthBusy:
+        raise _auth_busy()
+    new_user = User(username=user.username, hashed_password=hashed_password)
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return {"id": new_user.id, "username": new_user.username}
 
 @app.post("/login")
-def login(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first()
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    retry_after = login_limiter.hit(user.username)
+    if retry_after:
+        raise HttpException(status_code=429, detail="Too many login attempts, try again later",
+                            headers={"Retry-After": str(math.ceil(retry_after))})
+    db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
+    if not db_user:
+        raise HttpException(status_code=400, detail="Invalid credentials")
+    # Hand the connection back while bcrypt runs; queued logins must not drain the pool
+    await db.commit()
+    try:
+        valid, new_hash = await averify_password(user.password, db_user.hashed_password)
+    except AuthBusy:
+        raise _auth_busy()
+    if not valid:
         raise HttpException(status_code=400, detail="Invalid credentials")
+    if new_hash:
+        # Stored with an older BCRYPT_ROUNDS; upgrade it while we have the password
+        db_user.hashed_password = new_hash
+        await db.commit()
     return {"id": db_user.id, "username": db_user.username}
 
 @app.post("/chat")
-def save_message(chat: ChatCreate, db: Session = Depends(get_db)):
+async def save_message(chat: ChatCreate, db: AsyncSession = Depends(get_db)):
     new_chat = Chat(user_id=chat.user_id, title=chat.title, message=chat.message)
     db.add(new_chat)
-    db.commit()
-    db.refresh(new_chat)
+    await db.commit()
+    await db.refresh(new_chat)
     return {
         "id": new_chat.id,
         "title": new_chat.title,
@@ -65,83 +192,201 @@ def save_message(chat: ChatCreate, db: Session = Depends(get_db)):
         "timestamp": new_chat.timestamp,
     }
 
+CHATS_PAGE_LIMIT = 200
+
+def _chat_title(title: str | None, message: str | None) -> str:
+    return title or (message[:30] if message else "(No title)")
+
 @app.get("/chat/{user_id}")
-def get_chats(user_id: int, db: Session = Depends(get_db)):
-    chats = db.query(Chat).filter(Chat.user_id == user_id).order_by(Chat.timestamp.desc()).all()
+async def get_chats(
+    user_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=CHATS_PAGE_LIMIT),
+    cursor: str | None = None,
+    fields: str = Query("full", pattern="^(full|summary)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    """A user's chats, newest first, skipping ones without a message.
+
+    `fields=summary` returns only id, title and timestamp, which is all a
+    history list needs; fetch a chat's message and answer with
+    GET /chat/{user_id}/{chat_id}. Pages work like GET /cars: pass the
+    `X-Next-Cursor` header as `cursor` to get older chats.
+    """
+    columns = [Chat.id, Chat.title, Chat.timestamp]
+    if fields == "full":
+        columns += [Chat.message, Chat.answer]
+    else:
+        # Just enough of the message for the fallback title
+        columns.append(func.substr(Chat.message, 1, 30).label("message"))
+    try:
+        rows, next_cursor = await chat_page(db, user_id, columns, limit, cursor)
+    except InvalidCursor as e:
+        raise HttpException(status_code=400, detail=f"Invalid cursor: {e}")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    if fields == "summary":
+        return [ChatSummary(id=r.id, title=_chat_title(r.title, r.message), timestamp=r.timestamp) for r in rows]
     return [
-        {
-            "id": c.id,
-            "title": c.title or (c.message[:30] if c.message else "(No title)"),
-            "message": c.message,
-            "answer": c.answer,
-            "timestamp": c.timestamp,
-        }
-        for c in chats
+        ChatOut(id=r.id, title=_chat_title(r.title, r.message), timestamp=r.timestamp,
+                message=r.message, answer=r.answer)
+        for r in rows
     ]
 
+@app.get("/chat/{user_id}/{chat_id}", response_model=ChatOut)
+async def get_chat(user_id: int, chat_id: int, db: AsyncSession = Depends(get_db)):
+    chat = await db.get(Chat, chat_id)
+    if chat is None or chat.user_id != user_id:
+        raise HttpException(status_code=404, detail="Chat not found")
+    return ChatOut(id=chat.id, title=_chat_title(chat.title, chat.message), timestamp=chat.timestamp,
+                   message=chat.message, answer=chat.answer)
+
+CARS_PAGE_LIMIT = 200
+_car_list = TypeAdapter(list[CarOut])
+
+def _cacheable_json(request: Request, body: bytes, headers: dict | None = None) -> Response:
+    """JSON response with a content ETag; a matching If-None-Match gets an empty 304."""
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={CARS_CACHE_MAX_AGE}", **(headers or {})}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def car_filters(
+    make: str | None = None, model: str | None = None, city: str | None = None,
+    year_min: int | None = None, year_max: int | None = None,
+    price_min: float | None = None, price_max: float | None = None,
+    mileage_min: int | None = None, mileage_max: int | None = None,
+) -> SearchFilters:
+    return SearchFilters(
+        make=make, model=model, city=city, year_min=year_min, year_max=year_max,
+        price_min=price_min, price_max=price_max, mileage_min=mileage_min, mileage_max=mileage_max,
+    )
+
 @app.get("/cars", response_model=list[CarOut])
-def list_cars(limit: int = 50, db: Session = Depends(get_db)):
-    return db.query(Car).order_by(Car.price_num.asc().nulls_last()).limit(limit).all()
+async def list_cars(
+    request: Request,
+    filters: SearchFilters = Depends(car_filters),
+    limit: int = Query(50, ge=1, le=CARS_PAGE_LIMIT),
+    sort: str = Query("price", pattern=f"^-?({'|'.join(CAR_SORTS)})$"),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """List cars with filters, sorted by `sort` (prefix "-" for descending).
+
+    Pages are keyset-paginated: pass the `X-Next-Cursor` header of one page
+    as `cursor` to get the next one. The header is absent on the last page.
+    """
+    try:
+        cars, next_cursor = await car_page(db, filter_conditions(filters), sort, limit, cursor)
+    except InvalidCursor as e:
+        raise HttpException(status_code=400, detail=f"Invalid cursor: {e}")
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return _cacheable_json(request, _car_list.dump_json(cars), headers)
+
+@app.post("/cars/batch", response_model=list[CarOut])
+async def get_cars_batch(req: CarBatchRequest, db: AsyncSession = Depends(get_db)):
+    """Fetch up to 200 cars by id in one call, in request order; unknown ids are left out."""
+    return await get_cars(db, req.ids)
 
 @app.get("/cars/{car_id}", response_model=CarOut)
-def get_car(car_id: int, db: Session = Depends(get_db)):
-    car = db.query(Car).filter(Car.id == car_id).first()
-    if not car:
+async def get_car(car_id: int, request: Request, db: AsyncSession = Depends(get_db)):
+    cars = await get_cars(db, [car_id])
+    if not cars:
         raise HttpException(status_code=404, detail="Car not found")
-    return car
+    return _cacheable_json(request, cars[0].model_dump_json().encode())
 
-@app.post("/search", response_model=SearchResponse)
-def semantic_search(req: SearchRequest, db: Session = Depends(get_db)):
-    user_query = req.query
-    top_k = req.top_k
-
-    query_text = user_query
-    embed_resp = ollama_client.embed(model="bge-m3", input=query_text)
-    query_emb = embed_resp.embeddings[0]
-
-    results = collection.query(
-        query_embeddings=[query_emb],
-        n_results=50,
-        include=["distances", "metadatas"]
+async def _query_collection(query_emb, filters: SearchFilters | None):
+    # Chroma is sync; keep it off the event loop
+    results = await run_in_threadpool(
+        lambda: get_collection().query(
+            query_embeddings=[query_emb],
+            n_results=50,
+            where=build_where(filters),
+            include=["distances", "metadatas"]
+        )
     )
 
     ids = results["ids"][0]
     distances = results["distances"][0]
     metadatas = results["metadatas"][0]
 
-    items = sorted(zip(ids, distances, metadatas), key=lambda x: x[1])
-    sorted_items = items[:top_k]
-    sorted_ids = [int(item[0]) for item in sorted_items]
-    # order_case = case({id_: idx for idx, id_ in enumerate(sorted_ids)}, value=Car.id)
-    # cars = db.query(Car).filter(Car.id.in_(sorted_ids)).order_by(order_case).all()
-
-    structured_listings = "\n".join(
-        f"{i+1}. {item[2].get('title','N/A')} | {item[2].get('price_num','N/A')} € | "
-        f"{item[2].get('mileage_km','N/A')} km | "
-        f"{item[2].get('date_posted', 'N/A')} | "
-        f"{item[2].get('url','')}"
-        for i, item in enumerate(sorted_items)
-    )
+    return sorted(zip(ids, distances, metadatas), key=lambda x: x[1])
 
-    # LLM prompt always in English
-    prompt = (
-        f"The user asked: '{query_text}'\n"
-        f"These are the cars we found (use only this data, do NOT make up prices or mileage):\n"
-        f"{structured_listings}\n"
-        f"Answer concisely in English. Provide a short summary of the best car."
-    )
+def _fuse(vector_items, lexical_cars: list[Car]):
+    """Merge vector hits and keyword hits with reciprocal rank fusion.
 
-    response = ollama_client.generate(model="llama3.2:1b", prompt=prompt, stream=False)
-    answer_final = response["response"].strip()
+    Keyword-only hits get their metadata from the Postgres row and no distance.
+    """
+    by_id = {item[0]: item for item in vector_items}
+    for car in lexical_cars:
+        by_id.setdefault(str(car.id), (str(car.id), None, car_metadata(car)))
+    fused = reciprocal_rank_fusion([
+        [item[0] for item in vector_items],
+        [str(car.id) for car in lexical_cars],
+    ])
+    return [by_id[car_id] for car_id, _ in fused]
 
-    if req.user_id:
-        title = req.query[:50]
-        new_chat = Chat(user_id=req.user_id, title=title, message=req.query, answer=answer_final)
-        db.add(new_chat)
-        db.commit()
-        db.refresh(new_chat)
+async def _candidates(req: SearchRequest, db: AsyncSession, filters: SearchFilters | None, query_emb=None):
+    async def vector_side():
+        query = normalize_query(req.query)
+        emb = query_emb
+        if emb is None:
+            # The normalized text is embedded, so every request sharing the key gets the same vector
+            with span("embed"):
+                emb, _ = await embedding_flight.do(query, lambda: aget_embedding(query))
+        key = (query, json.dumps(build_where(filters), sort_keys=True, default=str))
+        with span("vector_search"):
+            hits, _ = await vector_search_flight.do(key, lambda: _query_collection(emb, filters))
+            return emb, hits
+
+    async def lexical_side():
+        with span("lexical_search"):
+            return await lexical_search(db, req.query, filters)
+
+    if not req.hybrid:
+        return await vector_side()
+    # Both retrievers run concurrently, so hybrid costs about as much as the slower one
+    (emb, vector_items), lexical_cars = await asyncio.gather(vector_side(), lexical_side())
+    return emb, _fuse(vector_items, lexical_cars)
+
+async def _retrieve(req: SearchRequest, db: AsyncSession):
+    """Embed the query and fetch the `top_k` best cars matching the filters.
+
+    Returns the query embedding, the hits and the filters that were applied.
+    Filters extracted from the query text are dropped again if they leave
+    nothing to show, since extraction is only a best guess.
+    """
+    filters = merge_filters(req.filters, extract_filters(req.query) if req.auto_filters else None)
 
-    retrieved_listings = [
+    query_emb, items = await _candidates(req, db, filters)
+    if not items and req.auto_filters and filters != req.filters:
+        filters = req.filters
+        query_emb, items = await _candidates(req, db, filters, query_emb)
+    reranker = get_reranker() if req.rerank else None
+    with span("hydrate"):
+        items = await _hydrate(db, items[:max(req.top_k, RERANK_CANDIDATES) if reranker else req.top_k])
+    if reranker:
+        with span("rerank", reranker=reranker.name, candidates=len(items)):
+            items = await rerank(req.query, items, reranker)
+    return query_emb, items[:req.top_k], filters
+
+async def _hydrate(db: AsyncSession, items):
+    """Swap Chroma metadata for the current Postgres record of each hit, keeping the ranking.
+
+    Hits whose car no longer exists (vectors not yet synced) are dropped.
+    Items become (id, distance, metadata, CarOut).
+    """
+    cars = {car.id: car for car in await get_cars(db, [int(item[0]) for item in items])}
+    return [
+        (item[0], item[1], car_metadata(cars[int(item[0])]), cars[int(item[0])])
+        for item in items
+        if int(item[0]) in cars
+    ]
+
+def _retrieved_cars(sorted_items) -> list[RetrievedCar]:
+    return [
         RetrievedCar(
             id=int(item[0]),
             distance=item[1],
@@ -153,12 +398,127 @@ def semantic_search(req: SearchRequest, db: Session = Depends(get_db)):
                 "date_posted": item[2].get("date_posted") if item[2].get("date_posted") else None,
                 "image_url": item[2].get("image_url"),
             },
+            car=item[3],
         )
         for item in sorted_items
     ]
 
+async def _save_chat(db: AsyncSession, req: SearchRequest, answer: str):
+    title = req.query[:50]
+    new_chat = Chat(user_id=req.user_id, title=title, message=req.query, answer=answer)
+    with span("chat_write"):
+        db.add(new_chat)
+        await db.commit()
+        await db.refresh(new_chat)
+    return new_chat
+
+@app.post("/search", response_model=SearchResponse)
+async def semantic_search(req: SearchRequest, db: AsyncSession = Depends(get_db)):
+    query_emb, sorted_items, filters = await _retrieve(req, db)
+    sorted_ids = [int(item[0]) for item in sorted_items]
+    with span("prompt_build"):
+        prompt, refs = build_context(req.query, sorted_items)
+
+    generation = collection_generation()
+    answer_final = answer_cache.lookup(query_emb, sorted_ids, generation)
+    cached = answer_final is not None
+    shared = False
+    if not cached:
+        chunks, leader = _shared_generation(req, sorted_ids, prompt)
+        with span("llm_generate"):
+            parts = [chunk["response"] async for chunk in chunks.read()]
+        # Cached with the links in, as refs are numbered by rank and a later hit may rank differently
+        answer_final = link_refs("".join(parts).strip(), refs)
+        shared = not leader
+        if leader:
+            answer_cache.store(query_emb, sorted_ids, generation, answer_final)
+
+    if req.user_id:
+        await _save_chat(db, req, answer_final)
+
     return SearchResponse(
         answer=answer_final,
-        retrieved_cars=retrieved_listings,
+        retrieved_cars=_retrieved_cars(sorted_items),
+        cached=cached,
+        shared=shared,
+        filters=filters,
+        references=refs,
     )
 
+async def _answer_chunks(prompt: str):
+    """The LLM answer as streamed chunks, recording token counts and errors."""
+    try:
+        chunks = await ollama_client.generate(model=LLM_MODEL, prompt=prompt, stream=True)
+        async for chunk in chunks:
+            if chunk.get("done"):
+                record_tokens(chunk)  # the final chunk carries the token counts
+            yield chunk
+    except Exception:
+        record_ollama_error("generate")
+        raise
+
+def _shared_generation(req: SearchRequest, sorted_ids: list[int], prompt: str):
+    """Answer chunks for this query and these hits, generated once for all identical concurrent searches.
+
+    The prompt is determined by the query and the ranked cars, so searches
+    differing only in case or spacing of the query share one generation.
+    Returns the SharedStream and whether this request started it.
+    """
+    key = (normalize_query(req.query), tuple(sorted_ids))
+    return generation_flight.stream(key, lambda: _answer_chunks(prompt))
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/search/stream")
+async def semantic_search_stream(req: SearchRequest, db: AsyncSession = Depends(get_db)):
+    """Server-sent events variant of /search.
+
+    Emits a `cars` event with the retrieved listings as soon as retrieval is
+    done, then one `token` event per chunk of the LLM answer, and finally a
+    `done` event with the full answer once the `Chat` row has been saved.
+    """
+    query_emb, sorted_items, _ = await _retrieve(req, db)
+    sorted_ids = [int(item[0]) for item in sorted_items]
+    with span("prompt_build"):
+        prompt, refs = build_context(req.query, sorted_items)
+    generation = collection_generation()
+    cached_answer = answer_cache.lookup(query_emb, sorted_ids, generation)
+
+    async def events():
+        yield _sse("cars", [car.model_dump(mode="json") for car in _retrieved_cars(sorted_items)])
+
+        shared = False
+        if cached_answer is not None:
+            answer_final = cached_answer
+            yield _sse("token", {"text": answer_final})
+        else:
+            parts = []
+            # No span around the yields: the generator is resumed from another context
+            started = time.perf_counter()
+            chunks, leader = _shared_generation(req, sorted_ids, prompt)
+            async for chunk in chunks.read():
+                parts.append(chunk["response"])
+                yield _sse("token", {"text": chunk["response"]})
+            observe_stage("llm_generate", time.perf_counter() - started)
+            answer_final = link_refs("".join(parts).strip(), refs)
+            shared = not leader
+            if leader:
+                answer_cache.store(query_emb, sorted_ids, generation, answer_final)
+
+        chat_id = None
+        if req.user_id:
+            # The request-scoped session is already closed once streaming starts
+            async with AsyncSessionLocal() as db:
+                chat_id = (await _save_chat(db, req, answer_final)).id
+
+        yield _sse("done", {
+            "answer": answer_final, "cached": cached_answer is not None, "shared": shared, "chat_id": chat_id,
+            "references": refs,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,163 @@
+import threading
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is +Inf
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds for histograms of LLM token counts per call
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+
+class Timer:
+    """Thread-safe histogram of durations in seconds (or of other sizes, given
+    matching `buckets`), plus count, sum and max."""
+
+    def __init__(self, name: str, description: str, labels: dict | None = None, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+
+    def observe(self, seconds: float):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self._counts[index] += 1
+            self._count += 1
+            self._sum += seconds
+            self._max = max(self._max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts, count, total, largest = list(self._counts), self._count, self._sum, self._max
+        cumulative, running = {}, 0
+        for bound, bucket in zip([*self.buckets, float("inf")], counts):
+            running += bucket
+            cumulative[str(bound)] = running
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            "max": largest,
+            "buckets": cumulative,  # cumulative, like a Prometheus histogram
+        }
+
+
+class Counter:
+    """Thread-safe monotonically increasing count."""
+
+    def __init__(self, name: str, description: str, labels: dict | None = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self._lock = threading.Lock()
+        self._value = 0
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> int:
+        return self._value
+
+
+class Gauge:
+    """Value read from a callback when metrics are collected (e.g. cache sizes)."""
+
+    def __init__(self, name: str, description: str, labels: dict | None = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.read = lambda: 0
+
+    def snapshot(self) -> float:
+        try:
+            return self.read()
+        except Exception:
+            return float("nan")
+
+
+def series_name(name: str, labels: dict) -> str:
+    """Prometheus-style series name, e.g. db_pool_checkout_seconds{pool="api"}."""
+    if not labels:
+        return name
+    escaped = {k: str(v).replace("\\", "\\\\").replace('"', '\\"') for k, v in labels.items()}
+    return name + "{" + ",".join(f'{k}="{v}"' for k, v in sorted(escaped.items())) + "}"
+
+
+_registry: dict[str, Timer | Counter | Gauge] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, description: str, labels: dict, **options):
+    key = series_name(name, labels)
+    with _registry_lock:
+        metric = _registry.get(key)
+        if metric is None:
+            metric = _registry[key] = cls(name, description, labels, **options)
+        return metric
+
+
+def timer(name: str, description: str = "", **labels) -> Timer:
+    return _get_or_create(Timer, name, description, labels)
+
+
+def histogram(name: str, description: str = "", buckets=DEFAULT_BUCKETS, **labels) -> Timer:
+    """A timer-style histogram with its own bucket bounds, e.g. TOKEN_BUCKETS."""
+    return _get_or_create(Timer, name, description, labels, buckets=buckets)
+
+
+def counter(name: str, description: str = "", **labels) -> Counter:
+    return _get_or_create(Counter, name, description, labels)
+
+
+def gauge(name: str, read, description: str = "", **labels) -> Gauge:
+    metric = _get_or_create(Gauge, name, description, labels)
+    metric.read = read
+    return metric
+
+
+def registered() -> list[Timer | Counter | Gauge]:
+    with _registry_lock:
+        return list(_registry.values())
+
+
+def snapshot(prefix: str = "") -> dict:
+    """Current value of every registered series whose metric name starts with `prefix`."""
+    return {
+        series_name(m.name, m.labels): m.snapshot()
+        for m in registered()
+        if m.name.startswith(prefix)
+    }
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format (0.0.4)."""
+    by_name: dict[str, list] = {}
+    for metric in registered():
+        by_name.setdefault(metric.name, []).append(metric)
+
+    lines = []
+    for name, series in sorted(by_name.items()):
+        kind = {Timer: "histogram", Counter: "counter", Gauge: "gauge"}[type(series[0])]
+        lines.append(f"# HELP {name} {series[0].description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for metric in series:
+            value = metric.snapshot()
+            if kind != "histogram":
+                lines.append(f"{series_name(name, metric.labels)} {_number(value)}")
+                continue
+            for bound, count in zip([*metric.buckets, float("inf")], value["buckets"].values()):
+                labels = {**metric.labels, "le": _number(bound)}
+                lines.append(f"{series_name(name + '_bucket', labels)} {count}")
+            lines.append(f"{series_name(name + '_sum', metric.labels)} {_number(value['sum'])}")
+            lines.append(f"{series_name(name + '_count', metric.labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
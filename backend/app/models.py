@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Text, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime, timezone
 from sqlalchemy.orm import relationship
@@ -22,6 +22,21 @@ class Car(Base):
     date_posted = Column(DateTime, nullable=True)
     scraped_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    # Dedup key used by the ingest upsert (scripts/insert_to_db.py)
+    __table_args__ = (
+        Index("uq_cars_title_mileage_year", "title", "mileage_km", "year",
+              unique=True, postgresql_nulls_not_distinct=True),
+        # Keyset pagination of GET /cars, one (sort column, id) index per sort
+        # key (app/pagination.py). The lower(make/model/city) filter indexes are
+        # expression indexes and live only in migration 7e2a9d4c6b10.
+        Index("ix_cars_price_num_id", "price_num", "id"),
+        Index("ix_cars_year_id", "year", "id"),
+        Index("ix_cars_mileage_km_id", "mileage_km", "id"),
+        Index("ix_cars_date_posted_id", "date_posted", "id"),
+        # Cars scraped since the last incremental embedding sync (app/backfill.py)
+        Index("ix_cars_scraped_at", "scraped_at"),
+    )
+
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -39,4 +54,9 @@ class Chat(Base):
     answer = Column(Text, nullable=True)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
-    owner = relationship("User", back_populates="chats")
\ No newline at end of file
+    owner = relationship("User", back_populates="chats")
+
+    # History pages of GET /chat/{user_id}, newest first (app/pagination.py)
+    __table_args__ = (
+        Index("ix_chats_user_id_timestamp_id", "user_id", "timestamp", "id"),
+    )
\ No newline at end of file
@@ -1,13 +1,61 @@
-from ollama import Client
+import asyncio
+from ollama import Client, AsyncClient
+from app.embedding_cache import get_embedding_cache
+from app.telemetry import record_ollama_error
 
 client = Client()
+async_client = AsyncClient()
+
+EMBEDDING_MODEL = "bge-m3"
+
+def _embed(texts: list[str], retries: int) -> list[list[float]]:
+    for attempt in range(retries):
+        try:
+            response = client.embed(model=EMBEDDING_MODEL, input=texts)
+            return response["embeddings"]
+        except Exception as e:
+            record_ollama_error("embed")
+            print(f"Attempt {attempt+1} failed ({len(texts)} texts): {e}")
+    raise RuntimeError(f"Embedding generation failed after {retries} attempts.")
+
+def get_embeddings(texts: list[str], retries: int = 3) -> list[list[float]]:
+    """Embed many texts, calling Ollama once (list input) for the cache misses."""
+    cache = get_embedding_cache()
+    if cache is None:
+        return _embed(texts, retries)
+
+    embeddings = cache.get_many(EMBEDDING_MODEL, texts)
+    missing = [i for i, emb in enumerate(embeddings) if emb is None]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        fresh = _embed(missing_texts, retries)
+        cache.put_many(EMBEDDING_MODEL, missing_texts, fresh)
+        for i, emb in zip(missing, fresh):
+            embeddings[i] = emb
+    return embeddings
 
 def get_embedding(text: str, retries: int = 3) -> list[float]:
+    return get_embeddings([text], retries=retries)[0]
+
+async def aget_embedding(text: str, retries: int = 3) -> list[float]:
+    """Async variant of get_embedding for the API request path."""
+    cache = get_embedding_cache()
+    if cache is not None:
+        cached = (await asyncio.to_thread(cache.get_many, EMBEDDING_MODEL, [text]))[0]
+        if cached is not None:
+            return cached
+
     for attempt in range(retries):
         try:
-            response = client.embeddings(model="bge-m3", prompt=text)
-            return response["embedding"]
+            response = await async_client.embed(model=EMBEDDING_MODEL, input=text)
+            embedding = response["embeddings"][0]
+            break
         except Exception as e:
+            record_ollama_error("embed")
             print(f"Attempt {attempt+1} failed: {e}")
-    raise RuntimeError(f"Embedding generation failed after {retries} attempts.")
+    else:
+        raise RuntimeError(f"Embedding generation failed after {retries} attempts.")
 
+    if cache is not None:
+        await asyncio.to_thread(cache.put_many, EMBEDDING_MODEL, [text], [embedding])
+    return embedding
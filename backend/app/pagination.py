@@ -0,0 +1,133 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Car, Chat
+import base64
+import json
+
+# Sort keys accepted by GET /cars; a leading "-" sorts descending
+CAR_SORTS = {
+    "price": Car.price_num,
+    "year": Car.year,
+    "mileage": Car.mileage_km,
+    "posted": Car.date_posted,
+}
+
+_PARSE = {
+    "price": Decimal,
+    "year": int,
+    "mileage": int,
+    "posted": datetime.fromisoformat,
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode(payload: list) -> str:
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded))
+
+
+def encode_cursor(sort: str, car: Car) -> str:
+    value = getattr(car, CAR_SORTS[sort.lstrip("-")].key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif value is not None:
+        value = str(value)
+    return _encode([sort, value, car.id])
+
+
+def decode_cursor(sort: str, cursor: str) -> tuple:
+    """Return (value, id) of the last car of the previous page."""
+    try:
+        cursor_sort, value, car_id = _decode(cursor)
+        if cursor_sort != sort:
+            raise InvalidCursor(f"cursor was issued for sort={cursor_sort}")
+        if value is not None:
+            value = _PARSE[sort.lstrip("-")](value)
+        return value, int(car_id)
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, KeyError, InvalidOperation) as e:
+        raise InvalidCursor("malformed cursor") from e
+
+
+async def keyset_rows(db: AsyncSession, stmt, column, id_column, descending: bool, wanted: int,
+                      after_value=None, after_id: int | None = None) -> list:
+    """Up to `wanted` rows of `stmt` in (column, id) order after (after_value, after_id).
+
+    Rows with a missing `column` come last in both directions. They are read
+    as two index range scans, first over the rows that have a value and then
+    over the ones that do not, each starting right after the cursor. No rows
+    before the cursor are read, so a deep page costs the same as the first one.
+    """
+    rows = []
+    if after_id is None or after_value is not None:
+        page = stmt.where(column.is_not(None))
+        if after_id is not None:
+            key = tuple_(column, id_column)
+            page = page.where(key < (after_value, after_id) if descending else key > (after_value, after_id))
+            after_id = None  # the null range, if reached, starts from its beginning
+        order = (column.desc(), id_column.desc()) if descending else (column.asc(), id_column.asc())
+        rows = list((await db.execute(page.order_by(*order).limit(wanted))).all())
+
+    if len(rows) < wanted:
+        page = stmt.where(column.is_(None))
+        if after_id is not None:
+            page = page.where(id_column < after_id if descending else id_column > after_id)
+        page = page.order_by(id_column.desc() if descending else id_column.asc()).limit(wanted - len(rows))
+        rows += list((await db.execute(page)).all())
+    return rows
+
+
+async def car_page(db: AsyncSession, conditions: list, sort: str, limit: int,
+                   cursor: str | None = None) -> tuple[list[Car], str | None]:
+    """One page of cars in `sort` order after `cursor`, and the cursor of the next page.
+
+    Cars are ordered by (sort column, id) with missing values last in both
+    directions (see keyset_rows).
+    """
+    after_value, after_id = decode_cursor(sort, cursor) if cursor else (None, None)
+    # One extra row tells us whether there is a next page
+    rows = await keyset_rows(db, select(Car).where(*conditions), CAR_SORTS[sort.lstrip("-")], Car.id,
+                             sort.startswith("-"), limit + 1, after_value, after_id)
+    cars = [row[0] for row in rows]
+
+    if len(cars) > limit:
+        return cars[:limit], encode_cursor(sort, cars[limit - 1])
+    return cars, None
+
+
+async def chat_page(db: AsyncSession, user_id: int, columns: list, limit: int,
+                    cursor: str | None = None) -> tuple[list, str | None]:
+    """One page of a user's chats, newest first, and the cursor of the next page.
+
+    Selects only `columns` (which must include Chat.id and Chat.timestamp), so
+    listing titles does not load every message and answer. Served by the
+    ix_chats_user_id_timestamp_id index.
+    """
+    after_value, after_id = None, None
+    if cursor:
+        try:
+            value, after_id = _decode(cursor)
+            after_value = datetime.fromisoformat(value) if value is not None else None
+            after_id = int(after_id)
+        except (ValueError, TypeError) as e:
+            raise InvalidCursor("malformed cursor") from e
+
+    stmt = select(*columns).where(Chat.user_id == user_id, func.trim(Chat.message) != "")
+    rows = await keyset_rows(db, stmt, Chat.timestamp, Chat.id, True, limit + 1, after_value, after_id)
+
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        timestamp = last.timestamp.isoformat() if last.timestamp else None
+        return rows[:limit], _encode([timestamp, last.id])
+    return rows, None
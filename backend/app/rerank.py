@@ -0,0 +1,169 @@
+import asyncio
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from app import metrics
+from app.backfill import car_document
+from app.config import RERANKER, RERANK_BUDGET_MS, RERANK_BATCH_SIZE, RERANK_ONNX_MODEL
+
+# Query words that make one feature matter more, English and Macedonian
+PRICE_CUES = {"cheap", "cheapest", "budget", "affordable", "inexpensive", "евтин", "евтина", "евтино", "евтини"}
+YEAR_CUES = {"new", "newer", "newest", "recent", "young", "нов", "нова", "ново", "нови", "понов"}
+MILEAGE_CUES = {"mileage", "km", "kilometers", "километри", "км", "поминати"}
+
+
+def _normalized(values: list) -> np.ndarray:
+    """Min-max scale to [0, 1] within the batch; missing values become 0."""
+    array = np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+    if np.all(np.isnan(array)):
+        return np.zeros(len(values))
+    lo, hi = np.nanmin(array), np.nanmax(array)
+    scaled = (array - lo) / (hi - lo) if hi > lo else np.ones(len(values))
+    return np.nan_to_num(scaled, nan=0.0)
+
+
+class FeatureReranker:
+    """Cheap scorer mixing retrieval rank with price, year, mileage and listing recency.
+
+    Features are scaled within the candidate set, so the score only says how
+    a car compares to the other hits. Features the query asks about (e.g.
+    "cheap", "newest", "low mileage") weigh more than the rest.
+    """
+
+    name = "features"
+    batch_size = 0  # scores are relative to the other candidates, so score them all at once
+
+    def __init__(self, base_weight: float = 0.15, cue_weight: float = 0.6, recency_weight: float = 0.1):
+        self.base_weight = base_weight
+        self.cue_weight = cue_weight
+        self.recency_weight = recency_weight
+
+    def load(self):
+        pass
+
+    def score(self, query: str, items) -> list[float]:
+        words = set(re.findall(r"\w+", query.lower()))
+        cars = [item[3] for item in items]
+        relevance = 1.0 - np.arange(len(items)) / max(len(items), 1)  # retrieval order
+        features = [
+            (PRICE_CUES, 1.0 - _normalized([c.price_num for c in cars])),
+            (YEAR_CUES, _normalized([c.year for c in cars])),
+            (MILEAGE_CUES, 1.0 - _normalized([c.mileage_km for c in cars])),
+        ]
+        scores = relevance.copy()
+        for cues, values in features:
+            scores += (self.cue_weight if words & cues else self.base_weight) * values
+        posted = [c.date_posted.timestamp() if c.date_posted else None for c in cars]
+        scores += self.recency_weight * _normalized(posted)
+        return scores.tolist()
+
+
+class OnnxCrossEncoder:
+    """Cross-encoder (e.g. an ONNX export of ms-marco-MiniLM) scoring (query, car) pairs on the CPU.
+
+    `model_dir` holds model.onnx and the matching tokenizer.json. onnxruntime
+    and tokenizers are imported on first use only.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, max_length: int = 256, batch_size: int = RERANK_BATCH_SIZE):
+        self.model_dir = model_dir
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self._session = None
+        self._tokenizer = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Open the model now instead of on the first (then over budget) query."""
+        with self._lock:
+            if self._session is None:
+                import onnxruntime
+                from tokenizers import Tokenizer
+
+                tokenizer = Tokenizer.from_file(os.path.join(self.model_dir, "tokenizer.json"))
+                tokenizer.enable_truncation(self.max_length)
+                tokenizer.enable_padding()
+                options = onnxruntime.SessionOptions()
+                options.intra_op_num_threads = 1  # one request must not take every core
+                self._session = onnxruntime.InferenceSession(
+                    os.path.join(self.model_dir, "model.onnx"), options, providers=["CPUExecutionProvider"]
+                )
+                self._inputs = {i.name for i in self._session.get_inputs()}
+                self._tokenizer = tokenizer
+
+    def score(self, query: str, items) -> list[float]:
+        if self._session is None:
+            self.load()
+        encodings = self._tokenizer.encode_batch([(query, car_document(item[3])) for item in items])
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        logits = self._session.run(None, {k: v for k, v in feed.items() if k in self._inputs})[0]
+        return logits.reshape(len(items), -1)[:, 0].tolist()
+
+
+def _score_within(reranker, query: str, items, deadline: float) -> list[float]:
+    """Scores of the leading items, one batch at a time, stopping before a batch would pass `deadline`."""
+    batch_size = reranker.batch_size or len(items)
+    scores, last_batch = [], 0.0
+    for start in range(0, len(items), batch_size):
+        started = time.perf_counter()
+        if scores and started + last_batch >= deadline:
+            break
+        scores += reranker.score(query, items[start:start + batch_size])
+        last_batch = time.perf_counter() - started
+    return scores
+
+
+async def rerank(query: str, items, reranker=None, budget_ms: float = RERANK_BUDGET_MS):
+    """Reorder hydrated hits by `reranker`, spending at most `budget_ms`.
+
+    Candidates are scored in batches in retrieval order. When the next
+    batch would not fit in the budget, the scored ones are reordered and the
+    rest keep their place after them; if a batch overruns anyway, the
+    retrieval order is returned unchanged. Either way the request waits no
+    longer than the budget.
+    """
+    reranker = reranker or get_reranker()
+    if reranker is None or len(items) < 2:
+        return items
+    deadline = time.perf_counter() + budget_ms / 1000
+    try:
+        scores = await asyncio.wait_for(
+            asyncio.to_thread(_score_within, reranker, query, items, deadline),
+            timeout=budget_ms / 1000,
+        )
+    except asyncio.TimeoutError:
+        metrics.counter("rerank_over_budget_total", "Reranks abandoned for exceeding the budget",
+                        reranker=reranker.name).inc()
+        return items
+    if len(scores) < len(items):
+        metrics.counter("rerank_partial_total", "Reranks that scored only part of the candidates",
+                        reranker=reranker.name).inc()
+    order = sorted(range(len(scores)), key=lambda i: -scores[i])
+    return [items[i] for i in order] + list(items[len(scores):])
+
+
+_rerankers = {}
+
+
+def get_reranker():
+    """The reranker named by RERANKER ("features" or "onnx"), or None when reranking is off."""
+    if not RERANKER:
+        return None
+    if RERANKER not in _rerankers:
+        if RERANKER == "features":
+            _rerankers[RERANKER] = FeatureReranker()
+        elif RERANKER == "onnx":
+            _rerankers[RERANKER] = OnnxCrossEncoder(RERANK_ONNX_MODEL)
+        else:
+            raise ValueError(f"Unknown RERANKER {RERANKER!r}")
+    return _rerankers[RERANKER]
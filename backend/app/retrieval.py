@@ -0,0 +1,78 @@
+import re
+
+from sqlalchemy import select, func, or_, case, literal, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.filters import filter_conditions
+from app.models import Car
+from app.schemas import SearchFilters
+
+RRF_K = 60  # standard reciprocal rank fusion constant
+
+STOPWORDS = {
+    "a", "an", "and", "the", "in", "on", "for", "with", "of", "to", "or", "me", "show", "find",
+    "car", "cars", "во", "на", "за", "со", "од", "до", "и", "или",
+}
+
+
+def query_terms(query: str) -> list[str]:
+    terms = re.findall(r"\w+", query.lower())
+    return list(dict.fromkeys(t for t in terms if len(t) > 1 and t not in STOPWORDS))
+
+
+def car_search_vector():
+    # Must match the expression of the ix_cars_search_vector GIN index. The
+    # constants are inlined rather than bound, so prepared statements keep
+    # matching it, and coalesce/|| are used because concat_ws is not IMMUTABLE.
+    empty, space = literal_column("''"), literal_column("' '")
+    text = (func.coalesce(Car.title, empty).op("||")(space).op("||")(func.coalesce(Car.make, empty))
+            .op("||")(space).op("||")(func.coalesce(Car.model, empty)))
+    return func.to_tsvector(literal_column("'simple'"), text)
+
+
+async def lexical_search(db: AsyncSession, query: str, filters: SearchFilters | None = None,
+                         limit: int = 50) -> list[Car]:
+    """Rank cars by keyword match on title, make and model.
+
+    On Postgres this is an OR full-text query served by the
+    ix_cars_search_vector index, ranked with ts_rank_cd so titles matching
+    more of the terms (e.g. "passat" and "b6") come first. Other databases
+    fall back to counting ILIKE matches.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    if db.bind.dialect.name == "postgresql":
+        document = car_search_vector()
+        tsquery = func.to_tsquery("simple", " | ".join(terms))
+        match = document.op("@@")(tsquery)
+        rank = func.ts_rank_cd(document, tsquery)
+    else:
+        haystack = func.lower(
+            func.coalesce(Car.title, "") + " " + func.coalesce(Car.make, "") + " " + func.coalesce(Car.model, "")
+        )
+        hits = [haystack.like(f"%{term}%") for term in terms]
+        match = or_(*hits)
+        rank = sum((case((hit, 1), else_=0) for hit in hits), literal(0))
+
+    stmt = (
+        select(Car)
+        .where(match, *filter_conditions(filters))
+        .order_by(rank.desc(), Car.id)
+        .limit(limit)
+    )
+    return (await db.execute(stmt)).scalars().all()
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[tuple[str, float]]:
+    """Fuse several ranked id lists into one, best first.
+
+    Each id scores sum(1 / (k + rank)) over the rankings it appears in, so
+    ids ranked well by both retrievers beat ids ranked first by only one.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
@@ -1,5 +1,5 @@
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from decimal import Decimal
 
@@ -20,19 +20,42 @@ class CarOut(BaseModel):
     
     model_config = {"from_attributes": True}
 
+class CarBatchRequest(BaseModel):
+    ids: list[int] = Field(max_length=200)
+
 class RetrievedCar(BaseModel):
     id: int
-    distance: float
+    distance: float | None  # None for keyword-only hits
     metadata: dict
+    car: Optional[CarOut] = None  # the current Postgres record
+
+class SearchFilters(BaseModel):
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    year_min: Optional[int] = None
+    year_max: Optional[int] = None
+    mileage_min: Optional[int] = None
+    mileage_max: Optional[int] = None
+    make: Optional[str] = None
+    model: Optional[str] = None
+    city: Optional[str] = None
 
 class SearchRequest(BaseModel):
     query: str
     top_k: int = 10
     user_id: Optional[int] = None
-    
+    filters: Optional[SearchFilters] = None
+    auto_filters: bool = False  # extract filters like "under 5000 €" or "in Bitola" from the query
+    hybrid: bool = True  # fuse keyword matches on title/make/model with the vector hits
+    rerank: bool = True  # apply the server's reranker (RERANKER), if one is configured
+
 class SearchResponse(BaseModel):
     answer: str
     retrieved_cars: list[RetrievedCar]
+    cached: bool = False
+    shared: bool = False  # the answer came from an identical search running at the same time
+    filters: Optional[SearchFilters] = None
+    references: dict[str, str] = {}  # [n] ref cited in the answer -> listing URL
 
     model_config = {"from_attributes": True}
     
@@ -43,4 +66,13 @@ class UserCreate(BaseModel):
 class ChatCreate(BaseModel):
     user_id: int
     message: str = ""
-    title: Optional[str] = None
\ No newline at end of file
+    title: Optional[str] = None
+
+class ChatSummary(BaseModel):
+    id: int
+    title: str
+    timestamp: datetime | None
+
+class ChatOut(ChatSummary):
+    message: str
+    answer: str | None
@@ -0,0 +1,99 @@
+import asyncio
+
+from app import metrics
+
+
+def normalize_query(query: str) -> str:
+    """Key under which queries count as the same: case and whitespace do not matter."""
+    return " ".join(query.lower().split())
+
+
+class SingleFlight:
+    """Deduplicates concurrent identical work in the event loop.
+
+    The first caller for a key (the leader) starts the work; callers with the
+    same key arriving before it finishes (followers) wait for that result
+    instead of starting their own. The work runs in its own task, so a leader
+    whose client disconnects does not cancel it for the followers. Nothing is
+    kept once the work is done; caching results is up to the caller.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict = {}
+
+    def _count(self, role: str):
+        metrics.counter("single_flight_total", "Calls joining (follower) or starting (leader) shared work",
+                        flight=self.name, role=role).inc()
+
+    def _start(self, key, value, task: asyncio.Future):
+        """Register `value` as the in-flight work for `key` until `task` is done."""
+        self._calls[key] = value
+        task.add_done_callback(lambda t: self._finished(key, value, t))
+
+    def _finished(self, key, value, task: asyncio.Future):
+        if self._calls.get(key) is value:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved, in case every caller went away
+
+    async def do(self, key, fn) -> tuple[object, bool]:
+        """Result of `fn()` (a coroutine function) and whether this caller was the leader."""
+        task = self._calls.get(key)
+        leader = task is None
+        if leader:
+            task = asyncio.ensure_future(fn())
+            self._start(key, task, task)
+        self._count("leader" if leader else "follower")
+        return await asyncio.shield(task), leader
+
+    def stream(self, key, source) -> tuple["SharedStream", bool]:
+        """SharedStream over the async iterator `source()` returns, and whether this caller started it."""
+        shared = self._calls.get(key)
+        leader = shared is None
+        if leader:
+            shared = SharedStream(source)
+            self._start(key, shared, shared.task)
+        self._count("leader" if leader else "follower")
+        return shared, leader
+
+
+class SharedStream:
+    """Consumes an async iterator once and replays it to any number of readers.
+
+    Every reader gets all items from the first one, however late it joins.
+    """
+
+    def __init__(self, source):
+        self._items = []
+        self._done = False
+        self._error = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source):
+        try:
+            async for item in source():
+                self._items.append(item)
+                self._wake()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def read(self):
+        i = 0
+        while True:
+            while i < len(self._items):
+                yield self._items[i]
+                i += 1
+            if self._done:
+                if self._error is not None:
+                    raise self._error
+                return
+            await self._changed.wait()
@@ -0,0 +1,92 @@
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import time
+
+from app import metrics
+from app.config import OTEL_EXPORTER_OTLP_ENDPOINT, OTEL_SERVICE_NAME
+
+# Per-request list of (stage, seconds), turned into the Server-Timing header
+_request_timings: ContextVar[list | None] = ContextVar("request_timings", default=None)
+_tracer = None
+
+
+def setup_tracing():
+    """Export spans over OTLP when OTEL_EXPORTER_OTLP_ENDPOINT is set; a no-op otherwise.
+
+    OpenTelemetry is imported here only, so it costs nothing when disabled.
+    """
+    global _tracer
+    if not OTEL_EXPORTER_OTLP_ENDPOINT or _tracer is not None:
+        return
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    # The exporter reads the endpoint and headers from the standard OTEL_* variables
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("collector")
+    print(f"Exporting traces to {OTEL_EXPORTER_OTLP_ENDPOINT}")
+
+
+def _otel_span(name: str, attributes: dict):
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def observe_stage(stage: str, seconds: float):
+    metrics.timer("stage_seconds", "Duration of one pipeline stage", stage=stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Time one pipeline stage.
+
+    The duration goes to the stage_seconds{stage=...} histogram, to the
+    Server-Timing header of the current request (if any), and to an OTLP span
+    when tracing is enabled. Works around awaits as well.
+    """
+    started = time.perf_counter()
+    with _otel_span(stage, attributes):
+        try:
+            yield
+        finally:
+            observe_stage(stage, time.perf_counter() - started)
+
+
+@contextmanager
+def request_span(method: str, path: str):
+    """Root span of an HTTP request; yields the list that `span` appends stage timings to."""
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        with _otel_span(f"{method} {path}", {"http.method": method, "http.target": path}):
+            yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def server_timing(timings: list[tuple[str, float]], total: float) -> str:
+    """Server-Timing header value, e.g. `embed;dur=12.1, llm_generate;dur=850.3, total;dur=870.0`."""
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def record_tokens(response: dict):
+    """Record prompt and completion token counts reported by an Ollama generate response."""
+    for kind, key in (("prompt", "prompt_eval_count"), ("completion", "eval_count")):
+        count = response.get(key)
+        if count:
+            metrics.histogram("llm_tokens", "Tokens per LLM call", metrics.TOKEN_BUCKETS, kind=kind).observe(count)
+
+
+def record_ollama_error(operation: str):
+    metrics.counter("ollama_errors_total", "Failed Ollama calls", operation=operation).inc()
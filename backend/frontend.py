@@ -2,6 +2,7 @@ from langdetect import detect, DetectorFactory
 import streamlit as st
 import requests
 import pandas as pd
+import json
 DetectorFactory.seed = 0 
 
 API_URL = "http://127.0.0.1:8000"
@@ -9,6 +10,8 @@ API_URL = "http://127.0.0.1:8000"
 for key, default in {
     "user": None,
     "chats": [],
+    "older_chats": [],
+    "chats_cursor": None,
     "active_chat": None,
     "search_results": [],
     "search_answer": "",
@@ -17,6 +20,7 @@ for key, default in {
     "sending": False,
     "search_text": "",
     "query_lang": "en",
+    "pending_query": None,
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
@@ -48,6 +52,8 @@ def handle_register():
 def handle_logout():
     st.session_state.user = None
     st.session_state.chats = []
+    st.session_state.older_chats = []
+    st.session_state.chats_cursor = None
     st.session_state.active_chat = None
     st.session_state.search_answer = ""
     st.session_state.search_results = []
@@ -56,26 +62,35 @@ def handle_logout():
 def handle_send(search_text):
     if not search_text.strip():
         return
+    lang = detect(search_text)
+    if lang not in ["en", "mk"]:
+        lang = "mk"  # Default to Macedonian if undetected
+    st.session_state.query_lang = lang
+    st.session_state.search_answer = ""
+    st.session_state.search_results = []
+    st.session_state.pending_query = search_text
     st.session_state.sending = True
-    try:
-        with st.spinner("Searching... please wait"):
-            lang = detect(search_text)
-            if lang not in ["en", "mk"]:
-                lang = "mk"  # Default to Macedonian if undetected
-            st.session_state.query_lang = lang
-            user_id = st.session_state.user["id"] if st.session_state.user else None
-            payload = {"query": search_text, "top_k": 10, "user_id": user_id}
-            res = requests.post(f"{API_URL}/search", json=payload)
-            if res.status_code == 200:
-                data = res.json()
-                st.session_state.search_answer = data["answer"]
-                st.session_state.search_results = data["retrieved_cars"]
-            else:
-                st.error(f"Search failed ({res.status_code})")
-    except requests.exceptions.RequestException:
-        st.error("Failed to connect to API")
-    finally:
-        st.session_state.sending = False
+
+def stream_search(search_text):
+    """Yield answer tokens from /search/stream, storing cars and the final answer as they arrive."""
+    user_id = st.session_state.user["id"] if st.session_state.user else None
+    payload = {"query": search_text, "top_k": 10, "user_id": user_id, "auto_filters": True}
+    with requests.post(f"{API_URL}/search/stream", json=payload, stream=True) as res:
+        if res.status_code != 200:
+            st.error(f"Search failed ({res.status_code})")
+            return
+        event = None
+        for line in res.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "cars":
+                    st.session_state.search_results = data
+                elif event == "token":
+                    yield data["text"]
+                elif event == "done":
+                    st.session_state.search_answer = data["answer"]
 
 col1, col2 = st.columns([8, 2])
 with col2:
@@ -100,18 +115,40 @@ if st.session_state.show_auth_modal:
         else:
             st.button("Register", key="register_submit", on_click=handle_register)
 
+def open_chat(chat_id):
+    user_id = st.session_state.user["id"]
+    res = requests.get(f"{API_URL}/chat/{user_id}/{chat_id}")
+    if res.status_code == 200:
+        st.session_state.active_chat = res.json()
+        st.session_state.search_answer = st.session_state.active_chat.get("answer") or ""
+        st.session_state.search_results = []
+
+def load_older_chats():
+    user_id = st.session_state.user["id"]
+    res = requests.get(
+        f"{API_URL}/chat/{user_id}",
+        params={"fields": "summary", "cursor": st.session_state.chats_cursor},
+    )
+    if res.status_code == 200:
+        st.session_state.older_chats += res.json()
+        st.session_state.chats_cursor = res.headers.get("X-Next-Cursor")
+
 st.sidebar.title("Chats")
 if st.session_state.user:
     user_id = st.session_state.user["id"]
-    res = requests.get(f"{API_URL}/chat/{user_id}")
+    # Titles only; a chat's message and answer are fetched when it is opened
+    res = requests.get(f"{API_URL}/chat/{user_id}", params={"fields": "summary"})
     if res.status_code == 200:
-        st.session_state.chats = [c for c in res.json() if c['message'].strip() != ""]
+        st.session_state.chats = res.json()
+        if not st.session_state.older_chats:
+            st.session_state.chats_cursor = res.headers.get("X-Next-Cursor")
     st.sidebar.subheader("Chat History")
-    for c in st.session_state.chats:
-        if st.sidebar.button(c['title'], key=f"chat_{c['id']}"):
-            st.session_state.active_chat = c['id']
-            st.session_state.search_answer = c.get("answer", "")
-            st.session_state.search_results = []
+    shown = {c["id"] for c in st.session_state.chats}
+    older = [c for c in st.session_state.older_chats if c["id"] not in shown]
+    for c in st.session_state.chats + older:
+        st.sidebar.button(c['title'], key=f"chat_{c['id']}", on_click=open_chat, args=(c['id'],))
+    if st.session_state.chats_cursor:
+        st.sidebar.button("Older chats", on_click=load_older_chats)
     if st.sidebar.button("New Chat"):
         st.session_state.active_chat = None
         st.session_state.search_answer = ""
@@ -129,13 +166,23 @@ st.button(
 
 if st.session_state.active_chat and st.session_state.user:
     st.subheader("Chat Messages")
-    for c in st.session_state.chats:
-        if c['id'] == st.session_state.active_chat:
-            st.write(f"{c['message']}")
-            if c.get("answer"):
-                st.write(f"{c['answer']}")
+    st.write(f"{st.session_state.active_chat['message']}")
+    if st.session_state.active_chat.get("answer"):
+        st.write(f"{st.session_state.active_chat['answer']}")
 
-if st.session_state.search_answer:
+if st.session_state.pending_query:
+    if st.session_state.get("query_lang") == "mk":
+        st.subheader("Резиме / Најдобар автомобил")
+    else:
+        st.subheader("Summary / Best Car")
+    try:
+        st.write_stream(stream_search(st.session_state.pending_query))
+    except requests.exceptions.RequestException:
+        st.error("Failed to connect to API")
+    finally:
+        st.session_state.pending_query = None
+        st.session_state.sending = False
+elif st.session_state.search_answer:
     if st.session_state.get("query_lang") == "mk":
         st.subheader("Резиме / Најдобар автомобил")
     else:
@@ -0,0 +1,411 @@
+"""Load test for the API against local stand-ins.
+
+Starts a fake Ollama (scripts.fake_ollama) and app.main:app under uvicorn
+with a temporary Chroma directory and a temporary SQLite database (or a
+scratch Postgres via --database-url), seeds synthetic cars and users, and
+replays the query corpus against each scenario at --concurrency:
+
+    python -m scripts.bench --concurrency 8 --requests 200
+    python -m scripts.bench --scenarios search cars --generate-latency 0.5 --compare data/bench/1a2b3c4.json
+
+Prints p50/p95/p99 latency and throughput per scenario, and writes them with
+the commit and settings to JSON (data/bench/<commit>.json by default) so
+runs can be compared across commits.
+
+Scenarios:
+    search        POST /search (with a user_id, so the chat row is written too)
+    cars          GET /cars with the structured filters of each corpus entry
+    chat          POST /chat
+    chat_history  GET /chat/{user_id}?fields=summary (the sidebar list)
+    login         POST /login (bcrypt verification)
+    login_storm   POST /search, while --storm-concurrency clients keep logging in;
+                  compare with `search` to see whether logins slow searches down
+    search_burst  POST /search, --concurrency consecutive requests asking the same query,
+                  like many users searching for the same trending car at once
+
+The login rate limit is off in the benchmark so logins exercise bcrypt.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "bench_queries.jsonl")
+SCENARIOS = ["search", "search_burst", "cars", "chat", "chat_history", "login", "login_storm"]
+PASSWORD = "bench-password"
+
+MODELS = {
+    "Volkswagen": ["Golf", "Passat", "Polo"], "BMW": ["320d", "520d", "X3"], "Audi": ["A4", "A6", "A3"],
+    "Mercedes-Benz": ["C220", "E220"], "Opel": ["Astra", "Corsa"], "Renault": ["Clio", "Megane"],
+    "Toyota": ["Yaris", "Corolla"], "Skoda": ["Octavia", "Fabia"], "Ford": ["Focus", "Fiesta"],
+}
+CITIES = ["Скопје", "Битола", "Охрид", "Куманово", "Тетово", "Прилеп"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_corpus(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def synthetic_cars(count: int, seed: int = 0) -> list[dict]:
+    """Reproducible car rows spread over the makes, models and cities the corpus asks for."""
+    rng = random.Random(seed)
+    now = datetime(2025, 6, 1)
+    rows = []
+    for i in range(count):
+        make = rng.choice(list(MODELS))
+        model = rng.choice(MODELS[make])
+        year = rng.randint(1998, 2023)
+        rows.append({
+            "title": f"{make} {model} {year} {rng.choice(['1.6 TDI', '2.0 TDI', '1.4 benzin', 'automatic', ''])} #{i}",
+            "make": make,
+            "model": model,
+            "city": rng.choice(CITIES),
+            "price_num": round(rng.uniform(1500, 35000), -1),
+            "year": year,
+            "mileage_km": rng.randint(5, 350) * 1000,
+            "date_posted": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+            # Shaped like the pazar3.mk ad URLs the scraper stores
+            "url": f"https://www.pazar3.mk/oglas/vozila/avtomobili/{make.lower()}/{model.lower()}/"
+                   f"prodazba/{4_000_000 + i}/{make.lower()}-{model.lower()}-{year}",
+        })
+    return rows
+
+
+def seed_database(cars: int):
+    """Create the tables and, if the cars table is empty, fill it with synthetic cars.
+
+    Imported here so app.config picks up the benchmark environment.
+    """
+    from sqlalchemy import select, func
+    from app.db.session import engine, SessionLocal
+    from app.models import Base, Car
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        if db.scalar(select(func.count()).select_from(Car)):
+            print("Cars table already populated, not seeding")
+            return
+        db.add_all(Car(**row) for row in synthetic_cars(cars))
+        db.commit()
+    print(f"Seeded {cars} cars")
+
+
+def _wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{process.args} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+class Stack:
+    """Fake Ollama plus the API, in subprocesses sharing one temporary directory."""
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="collector-bench-")
+        self.ollama_port, self.api_port = _free_port(), _free_port()
+        self.base_url = f"http://127.0.0.1:{self.api_port}"
+        self.env = {
+            **os.environ,
+            "OLLAMA_HOST": f"http://127.0.0.1:{self.ollama_port}",
+            "CHROMA_PATH": os.path.join(self.workdir, "chroma"),
+            "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(self.workdir, 'bench.db')}",
+            "EMBEDDING_CACHE_PATH": os.path.join(self.workdir, "embedding_cache.sqlite3"),
+            "ANSWER_CACHE_TTL": os.environ.get("ANSWER_CACHE_TTL", "600") if args.answer_cache else "0",
+            "LOGIN_RATE_LIMIT": "0",
+        }
+        self.processes = []
+
+    def _spawn(self, *command) -> subprocess.Popen:
+        process = subprocess.Popen([sys.executable, "-m", *command], env=self.env)
+        self.processes.append(process)
+        return process
+
+    def __enter__(self):
+        args = self.args
+        try:
+            ollama = self._spawn(
+                "scripts.fake_ollama", "--port", str(self.ollama_port),
+                "--embed-latency", str(args.embed_latency), "--generate-latency", str(args.generate_latency),
+                "--token-latency", str(args.token_latency), "--tokens", str(args.tokens),
+                "--prefill-latency", str(args.prefill_latency), "--parallel", str(args.ollama_parallel),
+            )
+            _wait_until_up(f"http://127.0.0.1:{self.ollama_port}/", ollama)
+
+            os.environ.update(self.env)
+            seed_database(args.cars)
+            subprocess.run([sys.executable, "-m", "app.backfill_runner"], env=self.env, check=True)
+
+            api = self._spawn("uvicorn", "app.main:app", "--port", str(self.api_port),
+                              "--workers", str(args.workers), "--log-level", "warning")
+            _wait_until_up(f"{self.base_url}/health", api)
+        except BaseException:
+            self.__exit__()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        for process in reversed(self.processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+async def register_users(client: httpx.AsyncClient, count: int) -> list[dict]:
+    users = []
+    for i in range(count):
+        credentials = {"username": f"bench_user_{i}", "password": PASSWORD}
+        r = await client.post("/register", json=credentials)
+        if r.status_code == 400:  # already there from an earlier run on the same database
+            r = await client.post("/login", json=credentials)
+        r.raise_for_status()
+        users.append({**credentials, "id": r.json()["id"]})
+    return users
+
+
+def make_requests(scenario: str, corpus: list[dict], users: list[dict], burst: int = 1):
+    """Function mapping the i-th request of `scenario` to (method, url, keyword arguments)."""
+    def request_for(scenario: str, i: int):
+        entry, user = corpus[i % len(corpus)], users[i % len(users)]
+        if scenario == "search":
+            return "POST", "/search", {"json": {"query": entry["query"], "user_id": user["id"]}}
+        if scenario == "search_burst":
+            entry = corpus[i // burst % len(corpus)]
+            return "POST", "/search", {"json": {"query": entry["query"], "user_id": user["id"]}}
+        if scenario == "cars":
+            return "GET", "/cars", {"params": entry.get("params", {})}
+        if scenario == "chat":
+            return "POST", "/chat", {"json": {"user_id": user["id"], "title": entry["query"][:50],
+                                              "message": entry["query"]}}
+        if scenario == "chat_history":
+            return "GET", f"/chat/{user['id']}", {"params": {"fields": "summary"}}
+        if scenario == "login_storm":
+            return request_for("search", i)
+        if scenario == "login":
+            return "POST", "/login", {"json": {"username": user["username"], "password": user["password"]}}
+        raise ValueError(f"Unknown scenario {scenario}")
+    return lambda i: request_for(scenario, i)
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not values:
+        return float("nan")
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+async def run_scenario(client: httpx.AsyncClient, request, total: int, concurrency: int) -> dict:
+    """Send `total` requests from `concurrency` closed-loop workers."""
+    jobs = iter(range(total))
+    latencies, errors = [], 0
+
+    async def worker():
+        nonlocal errors
+        for i in jobs:
+            method, url, kwargs = request(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            latencies.append(time.perf_counter() - started)
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2),
+        },
+    }
+
+
+async def login_storm(client: httpx.AsyncClient, request, concurrency: int, stop: asyncio.Event) -> dict:
+    """Keep `concurrency` clients logging in until `stop` is set."""
+    sent, errors = 0, 0
+
+    async def worker():
+        nonlocal sent, errors
+        while not stop.is_set():
+            method, url, kwargs = request(sent)
+            sent += 1
+            try:
+                failed = (await client.request(method, url, **kwargs)).status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"logins": sent, "errors": errors, "throughput_rps": round(sent / elapsed, 2)}
+
+
+async def run_during_login_storm(client: httpx.AsyncClient, request, login_request, args) -> dict:
+    limits = httpx.Limits(max_connections=args.storm_concurrency)
+    async with httpx.AsyncClient(base_url=client.base_url, timeout=args.timeout, limits=limits) as storm_client:
+        stop = asyncio.Event()
+        storm = asyncio.create_task(login_storm(storm_client, login_request, args.storm_concurrency, stop))
+        await asyncio.sleep(1.0)  # let the auth pool saturate first
+        try:
+            result = await run_scenario(client, request, args.requests, args.concurrency)
+        finally:
+            stop.set()
+        result["storm"] = await storm
+        return result
+
+
+_STAGE_LINE = re.compile(r'^stage_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$')
+
+
+async def stage_means(client: httpx.AsyncClient) -> dict:
+    """Mean server-side duration (ms) of each pipeline stage, read from /metrics."""
+    totals = {}
+    for line in (await client.get("/metrics")).text.splitlines():
+        match = _STAGE_LINE.match(line)
+        if match:
+            kind, stage, value = match.groups()
+            totals.setdefault(stage, {})[kind] = float(value)
+    return {
+        stage: round(t["sum"] / t["count"] * 1000, 2)
+        for stage, t in totals.items()
+        if t.get("count")
+    }
+
+
+async def run(args, base_url: str) -> dict:
+    corpus = load_corpus(args.corpus)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        users = await register_users(client, args.users)
+        results = {}
+        for scenario in args.scenarios:
+            request = make_requests(scenario, corpus, users, burst=args.concurrency)
+            if args.warmup:
+                await run_scenario(client, request, args.warmup, args.concurrency)
+            if scenario == "login_storm":
+                login_request = make_requests("login", corpus, users)
+                results[scenario] = await run_during_login_storm(client, request, login_request, args)
+            else:
+                results[scenario] = await run_scenario(client, request, args.requests, args.concurrency)
+            print_result(scenario, results[scenario])
+        return {"results": results, "stage_mean_ms": await stage_means(client)}
+
+
+def print_result(scenario: str, result: dict):
+    latency = result["latency_ms"]
+    print(f"{scenario:13} {result['throughput_rps']:8.1f} req/s  p50 {latency['p50']:8.1f} ms  "
+          f"p95 {latency['p95']:8.1f} ms  p99 {latency['p99']:8.1f} ms  errors {result['errors']}")
+    if "storm" in result:
+        storm = result["storm"]
+        print(f"{'':13} meanwhile {storm['logins']} logins ({storm['throughput_rps']:.1f}/s, {storm['errors']} errors)")
+
+
+def compare(report: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline.get('commit')} ({baseline_path}):")
+    for scenario, result in report["results"].items():
+        old = baseline.get("results", {}).get(scenario)
+        if not old:
+            continue
+        changes = []
+        for key in ("p50", "p95", "p99"):
+            before, after = old["latency_ms"][key], result["latency_ms"][key]
+            changes.append(f"{key} {before:.1f} -> {after:.1f} ms ({(after - before) / before * 100:+.0f}%)"
+                           if before else f"{key} {after:.1f} ms")
+        print(f"  {scenario:13} " + ", ".join(changes))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="JSON lines with a query and /cars params")
+    parser.add_argument("--cars", type=int, default=2000, help="synthetic cars to seed an empty database with")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--database-url", help="scratch Postgres to use instead of a temporary SQLite file")
+    parser.add_argument("--storm-concurrency", type=int, default=32, help="clients logging in during login_storm")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="fake Ollama seconds per embed call")
+    parser.add_argument("--generate-latency", type=float, default=0.3, help="fake Ollama seconds to first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="fake Ollama seconds between tokens")
+    parser.add_argument("--prefill-latency", type=float, default=0.0005, help="fake Ollama seconds per prompt token")
+    parser.add_argument("--tokens", type=int, default=0, help="fake answer length in tokens")
+    parser.add_argument("--ollama-parallel", type=int, default=0,
+                        help="generations the fake Ollama runs at once (default: no limit)")
+    parser.add_argument("--answer-cache", action="store_true",
+                        help="keep the semantic answer cache on (off by default so /search measures generation)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="results JSON (default: data/bench/<commit>.json)")
+    parser.add_argument("--compare", help="earlier results JSON to print the latency change against")
+    args = parser.parse_args()
+
+    settings = {k: v for k, v in vars(args).items() if k not in ("output", "compare", "database_url")}
+    settings["database"] = "postgresql" if args.database_url else "sqlite"
+    with Stack(args) as stack:
+        measured = asyncio.run(run(args, stack.base_url))
+
+    report = {
+        "commit": _commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": settings,
+        **measured,
+    }
+    output = args.output or os.path.join("data", "bench", f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {output}")
+    if args.compare:
+        compare(report, args.compare)
@@ -1,10 +1,22 @@
-from .scraper import scrape_cars       
-from .cleaner import clean_data        
-from .insert_to_db import insert_cleaned_to_db  
+import asyncio
+import time
+from datetime import datetime
+import pandas as pd
+from .scraper import scrape_cars, BASE_URL, MAX_PAGES, CRAWL_DELAY, CONCURRENCY, CHECKPOINT_PATH
+from .crawler import crawl
+from .parsers import PARSERS, DEFAULT_PARSER
+from .cleaner import clean_data, clean_frame
+from .insert_to_db import insert_cleaned_to_db, prepare_rows, upsert_rows
+from app.chroma_client import bump_generation
+from app.db.session import SessionLocal
+from app.models import Car
 
-def main():
+QUEUE_SIZE = 2  # pages buffered between two stages
+DONE = None     # end-of-stream marker passed down the queues
+
+def main(**scrape_options):
     print("Starting scraping...")
-    raw_df = scrape_cars()
+    raw_df = scrape_cars(**scrape_options)
     print(f"Scraped {len(raw_df)} cars.")
 
     print("Cleaning data...")
@@ -12,8 +24,107 @@ def main():
     print(f"Cleaned data contains {len(cleaned_df)} cars.")
 
     print("Inserting into database...")
-    insert_cleaned_to_db(cleaned_df, csv_path='data/cleaned/cars.csv')
+    insert_cleaned_to_db(cleaned_df)
     print("Pipeline finished successfully!")
 
+async def _stage(inbox: asyncio.Queue, outbox: asyncio.Queue | None, work):
+    """Apply `work` to every item of `inbox`, passing non-None results on to `outbox`."""
+    while (item := await inbox.get()) is not DONE:
+        result = await work(item)
+        if outbox is not None and result is not None:
+            await outbox.put(result)
+    if outbox is not None:
+        await outbox.put(DONE)
+
+async def stream_pipeline(max_pages=MAX_PAGES, crawl_delay=CRAWL_DELAY, base_url=BASE_URL,
+                          concurrency=CONCURRENCY, checkpoint_path=CHECKPOINT_PATH,
+                          on_conflict="nothing", embed=False, queue_size=QUEUE_SIZE,
+                          parser=DEFAULT_PARSER):
+    """Scrape, clean, insert (and optionally embed) one listing page at a time.
+
+    The stages run concurrently and hand pages to each other through bounded
+    queues, so a slow stage holds back the crawl instead of letting pages pile
+    up in memory, and cars are committed (and searchable, with `embed`) while
+    the crawl is still running. Blocking work runs in worker threads.
+    """
+    if embed:
+        # Embedding pulls in the Ollama and Chroma clients, which plain ETL runs do not need
+        from app.backfill import car_item, embed_items
+
+    now = datetime.now()  # one reference time for relative dates, as in a batch run
+    stats = {"pages": 0, "scraped": 0, "inserted": 0, "embedded": 0}
+    started = time.perf_counter()
+    raw, cleaned, inserted = (asyncio.Queue(maxsize=queue_size) for _ in range(3))
+
+    async def scrape():
+        async for page, cars in crawl(base_url, PARSERS[parser], max_pages,
+                                      rate=1 / crawl_delay, concurrency=concurrency,
+                                      checkpoint_path=checkpoint_path):
+            stats["pages"] += 1
+            stats["scraped"] += len(cars)
+            await raw.put((page, cars))
+        await raw.put(DONE)
+
+    async def clean(item):
+        page, cars = item
+        return page, await asyncio.to_thread(clean_frame, pd.DataFrame(cars), now=now)
+
+    def write(rows):
+        with SessionLocal() as session:
+            ids = upsert_rows(session, rows, on_conflict=on_conflict)
+            session.commit()
+        return ids
+
+    async def insert(item):
+        page, df = item
+        try:
+            ids = await asyncio.to_thread(write, prepare_rows(df))
+        except Exception as e:
+            print(f"Error inserting page {page}:", e)
+            return None
+        if ids:
+            await asyncio.to_thread(bump_generation)  # cached /search answers may quote the old rows
+        stats["inserted"] += len(ids)
+        print(f"Page {page}: {len(df)} cars cleaned, {len(ids)} added or updated.")
+        return (page, ids) if embed and ids else None
+
+    def embed_cars(ids):
+        with SessionLocal() as session:
+            cars = session.query(Car).filter(Car.id.in_(ids)).order_by(Car.id).all()
+            return embed_items([car_item(car) for car in cars])
+
+    async def embed_page(item):
+        page, ids = item
+        stats["embedded"] += await asyncio.to_thread(embed_cars, ids)
+
+    async with asyncio.TaskGroup() as tasks:
+        tasks.create_task(scrape())
+        tasks.create_task(_stage(raw, cleaned, clean))
+        tasks.create_task(_stage(cleaned, inserted if embed else None, insert))
+        if embed:
+            tasks.create_task(_stage(inserted, None, embed_page))
+
+    elapsed = time.perf_counter() - started
+    print(f"Streamed {stats['pages']} pages ({stats['scraped']} cars scraped, "
+          f"{stats['inserted']} added or updated, {stats['embedded']} embedded) in {elapsed:.1f}s.")
+    return stats
+
 if __name__ == "__main__":
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description="Scrape, clean and insert car listings")
+    parser.add_argument("--stream", action="store_true",
+                        help="process listings page by page instead of in whole-DataFrame stages")
+    parser.add_argument("--embed", action="store_true", help="with --stream, also embed new cars into ChromaDB")
+    parser.add_argument("--update", action="store_true", help="with --stream, refresh cars that already exist")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--crawl-delay", type=float, default=CRAWL_DELAY)
+    parser.add_argument("--parser", choices=sorted(PARSERS), default=DEFAULT_PARSER)
+    args = parser.parse_args()
+
+    if args.stream:
+        asyncio.run(stream_pipeline(max_pages=args.max_pages, crawl_delay=args.crawl_delay,
+                                    base_url=args.base_url, embed=args.embed, parser=args.parser,
+                                    on_conflict="update" if args.update else "nothing"))
+    else:
+        main(max_pages=args.max_pages, crawl_delay=args.crawl_delay, base_url=args.base_url, parser=args.parser)
@@ -1,6 +1,10 @@
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime, timedelta
 from decimal import Decimal, InvalidOperation
+from .snapshots import CLEANED_DATASET, CLEANED_SCHEMA, RAW_DATASET, RAW_SCHEMA, write_snapshot, latest_snapshots
 
 MAX_DB_VALUE = Decimal("99999999.99")  # NUMERIC(10,2) max
 
@@ -43,9 +47,9 @@ MONTHS = {
     'јул.': 7, 'авг.': 8, 'сеп.': 9, 'окт.': 10, 'ноем.': 11, 'дек.': 12
 }
 
-def parse_date(date_str):
+def parse_date(date_str, now=None):
     date_str = str(date_str).strip()
-    now = datetime.now()
+    now = now or datetime.now()
     
     if date_str.startswith('Денес'):
         time_part = date_str.split()[1]
@@ -72,11 +76,131 @@ def parse_date(date_str):
                 return None
     return None
 
-# --- Main cleaning function ---
-def clean_data(df: pd.DataFrame,
-               output_csv='data/cleaned/cars_cleaned.csv',
-               output_json='data/cleaned/cars_cleaned.json') -> pd.DataFrame:
+# --- Vectorized parsers ---
+# Column-wise equivalents of parse_price/parse_date above, which are kept as
+# the reference implementation. String work runs in Arrow compute kernels
+# (RE2 regexes, so whitespace classes are spelled out to match str.split()),
+# and since listing prices and dates repeat a lot, each distinct value is
+# parsed once and the results are broadcast back.
+# Prices come back as float64 (NaN for None), dates as datetime64 (NaT).
+# Rare values the kernels would read differently from Decimal()/int() (e.g.
+# "1_000", non-ASCII digits, half-cent amounts) go through the reference
+# functions instead. The one intended difference: "Денес"/"Вчера" without a
+# valid time is NaT, where parse_date raises. `python -m scripts.cleaner_check`
+# compares both implementations.
+MKD_PER_EUR = 61.5  # adjust if exchange rate changes
+_WS, _NON_WS = r'[\s\p{Z}]', r'[^\s\p{Z}]'
+_DECIMAL_RE = r'^[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$'
+_DATE_RE = (
+    rf'^(?:(?P<rel>Денес|Вчера){_NON_WS}*{_WS}+(?P<rel_hour>\d+):(?P<rel_minute>\d+)(?:{_WS}.*)?'
+    rf'|(?P<day>\d+){_WS}+(?P<month>{_NON_WS}+){_WS}+(?P<hour>\d+):(?P<minute>\d+))$'
+)
+# Decimal() also takes underscores, other whitespace and Unicode digits, and
+# rounds half-cents exactly; amounts with more than two decimals are rare
+_ODD_PRICE_RE = r'_|[^\x20-\x7E]|\.\d{3}|\dE[+-]?\d'
+# int() also takes signs, underscores and Unicode digits; str.split() splits
+# on control characters that RE2's \s does not cover
+_ODD_DATE_RE = r'[_+\-\x00-\x08\x0B\x0E-\x1F\x7F-\x9F]'
+_NULL_STRING = pa.scalar(None, pa.string())
+
+def _parse_distinct(values: pd.Series, parse, dtype) -> pd.Series:
+    codes, uniques = pd.factorize(values)
+    parsed = np.asarray(parse(uniques.to_numpy(dtype=object))).astype(dtype)
+    missing = np.full(1, np.nan).astype(dtype)  # code -1: NaN/None input
+    return pd.Series(np.concatenate([parsed, missing])[codes], index=values.index)
+
+def _groups(text: pa.Array, pattern: str) -> dict[str, pa.Array]:
+    struct = pc.extract_regex(text, pattern)
+    # Non-matching rows are null; groups of the other alternative are ""
+    return {
+        name: pc.if_else(pc.equal(column, ""), _NULL_STRING, column)
+        for name, column in zip(struct.type.names, struct.flatten())
+    }
+
+def _numbers(column: pa.Array) -> np.ndarray:
+    return column.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+def _matches(text: pa.Array, pattern: str) -> np.ndarray:
+    return pc.fill_null(pc.match_substring_regex(text, pattern), False).to_numpy(zero_copy_only=False)
+
+def _non_ascii_digits(text: pa.Array) -> np.ndarray:
+    return _matches(pc.replace_substring_regex(text, "[0-9]", ""), r"\p{Nd}")
+
+def _parse_prices(prices: np.ndarray) -> np.ndarray:
+    # Non-strings are None, matching parse_price's isinstance check
+    text = pa.array([p if isinstance(p, str) else None for p in prices], type=pa.string())
+    text = pc.utf8_upper(pc.replace_substring(text, " ", ""))
+
+    has_eur = pc.fill_null(pc.match_substring(text, "EUR"), False).to_numpy(zero_copy_only=False)
+    has_mkd = ~has_eur & pc.fill_null(pc.match_substring(text, "MKD"), False).to_numpy(zero_copy_only=False)
+    other = ~has_eur & ~has_mkd & pc.is_valid(text).to_numpy(zero_copy_only=False)
+
+    # EUR/MKD amounts must be a valid decimal once the currency is removed
+    amount = pc.if_else(has_eur, pc.replace_substring(text, "EUR", ""), pc.replace_substring(text, "MKD", ""))
+    amount = _numbers(pc.if_else(pc.match_substring_regex(amount, _DECIMAL_RE), amount, _NULL_STRING))
+
+    # Unknown formats: keep the digits, big numbers are assumed to be MKD
+    digits = pc.replace_substring_regex(text, r"\D", "")
+    digits = _numbers(pc.if_else(pc.equal(digits, ""), _NULL_STRING, digits))
+
+    value = np.full(len(prices), np.nan)
+    value[has_eur] = amount[has_eur]
+    value[has_mkd] = amount[has_mkd] / MKD_PER_EUR
+    value[other] = np.where(digits[other] > 1000, digits[other] / MKD_PER_EUR, digits[other])
+
+    value = np.round(value, 2)
+    value = np.where(value <= float(MAX_DB_VALUE), value, np.nan)
+
+    for i in np.flatnonzero(_matches(text, _ODD_PRICE_RE) | _non_ascii_digits(text)):
+        reference = parse_price(prices[i])
+        value[i] = np.nan if reference is None else float(reference)
+    return value
+
+def parse_price_series(prices: pd.Series) -> pd.Series:
+    return _parse_distinct(prices, _parse_prices, "float64")
+
+def _parse_dates(dates: np.ndarray, now: datetime) -> pd.Series:
+    text = pc.utf8_trim_whitespace(pa.array([str(d) for d in dates], type=pa.string()))
+    parts = _groups(text, _DATE_RE)
+
+    # "Денес 14:30" / "Вчера 09:15"
+    rel = pd.Series(parts['rel'].to_numpy(zero_copy_only=False))
+    rel_hour, rel_minute = pd.Series(_numbers(parts['rel_hour'])), pd.Series(_numbers(parts['rel_minute']))
+    valid = (rel.notna() & (rel_hour < 24) & (rel_minute < 60)).to_numpy()
+    minutes = np.where(rel == 'Вчера', -24 * 60, 0) + rel_hour * 60 + rel_minute
+    offsets = np.where(valid, minutes, 0).astype('int64').astype('timedelta64[m]')
+    relative = pd.Series(np.datetime64(pd.Timestamp(now).normalize(), 'ns') + offsets)
+    relative[~valid] = pd.NaT
+
+    # "12 мар. 10:45" in the current year; impossible days (31 фев.) are dropped
+    month = pd.Series(parts['month'].to_numpy(zero_copy_only=False)).map(MONTHS).to_numpy(dtype=float)
+    day, hour, minute = _numbers(parts['day']), _numbers(parts['hour']), _numbers(parts['minute'])
+    valid = (month > 0) & (day >= 1) & (day <= 31) & (hour < 24) & (minute < 60)
+    first_of_month = np.datetime64(f"{now.year:04d}-01", 'M') + np.where(valid, month - 1, 0).astype('int64')
+    days = first_of_month.astype('datetime64[D]') + np.where(valid, day - 1, 0).astype('int64')
+    valid &= days.astype('datetime64[M]') == first_of_month
+    minutes = np.where(valid, hour * 60 + minute, 0).astype('int64').astype('timedelta64[m]')
+    explicit = (days + minutes).astype('datetime64[ns]')
+
+    result = relative.astype('datetime64[ns]')
+    result[valid] = explicit[valid]
+
+    for i in np.flatnonzero(_matches(text, _ODD_DATE_RE) | _non_ascii_digits(text)):
+        try:
+            reference = parse_date(dates[i], now=now)
+        except (IndexError, ValueError):
+            reference = None  # "Денес"/"Вчера" without a valid time
+        result[i] = pd.NaT if reference is None else reference
+    return result
+
+def parse_date_series(dates: pd.Series, now: datetime | None = None) -> pd.Series:
+    """Parse listing dates in one pass against a single reference time."""
+    now = now or datetime.now()
+    return _parse_distinct(dates, lambda uniques: _parse_dates(uniques, now), "datetime64[ns]")
 
+# --- Main cleaning function ---
+def clean_frame(df: pd.DataFrame, vectorized=True, now=None) -> pd.DataFrame:
+    """Clean a DataFrame of raw listings in memory, without writing any files."""
     df_cleaned = df.copy()
 
     # Fill missing strings
@@ -89,30 +213,42 @@ def clean_data(df: pd.DataFrame,
     df_cleaned['municipality'] = df_cleaned['municipality'].fillna('no_municipality')
 
     # Parse numeric/date fields
-    df_cleaned['price'] = df_cleaned['price'].apply(parse_price)
+    if vectorized:
+        df_cleaned['price'] = parse_price_series(df_cleaned['price'])
+        df_cleaned['date'] = parse_date_series(df_cleaned['date'], now=now)
+    else:
+        df_cleaned['price'] = df_cleaned['price'].apply(parse_price)
+        df_cleaned['date'] = df_cleaned['date'].apply(parse_date)
     df_cleaned['mileage'] = pd.to_numeric(df_cleaned['mileage'], errors='coerce').astype('Int64')
     df_cleaned['year'] = df_cleaned['year'].astype('Int64')
-    df_cleaned['date'] = df_cleaned['date'].apply(parse_date)
+    return df_cleaned
 
-    # Save cleaned data
-    df_cleaned.to_csv(output_csv, index=False, encoding='utf-8-sig')
-    df_cleaned.to_json(output_json, orient='records', force_ascii=False, indent=4)
+def clean_data(df: pd.DataFrame,
+               output_dir=CLEANED_DATASET,
+               vectorized=True,
+               now=None,
+               run=None) -> pd.DataFrame:
 
-    print("Data cleaned and saved to CSV and JSON.")
+    df_cleaned = clean_frame(df, vectorized=vectorized, now=now)
+
+    # Save cleaned data as this run's snapshot partition
+    run = write_snapshot(df_cleaned, output_dir, CLEANED_SCHEMA, run=run)
+
+    print(f"Data cleaned and saved to {output_dir}/run={run}.")
     return df_cleaned
 
 if __name__ == "__main__":
     import sys
     import os
-    if len(sys.argv) < 2:
-        print("Usage: python clean_cars.py <raw_csv_file>")
-        sys.exit(1)
+    raw_path = sys.argv[1] if len(sys.argv) > 1 else RAW_DATASET
 
-    raw_csv = sys.argv[1]
-
-    if not os.path.exists(raw_csv):
-        print(f"File not found: {raw_csv}")
+    if not os.path.exists(raw_path):
+        print(f"Not found: {raw_path}")
+        print("Usage: python -m scripts.cleaner [raw_csv_file | raw_snapshot_dir]")
         sys.exit(1)
 
-    df_raw = pd.read_csv(raw_csv, encoding='utf-8-sig')
+    if os.path.isdir(raw_path):
+        df_raw = latest_snapshots(raw_path, RAW_SCHEMA)
+    else:
+        df_raw = pd.read_csv(raw_path, encoding='utf-8-sig')
     clean_data(df_raw)
@@ -0,0 +1,120 @@
+"""Equivalence check of the vectorized cleaner against the reference parsers.
+
+Runs parse_price/parse_date and parse_price_series/parse_date_series over a
+fixed sample of listing prices and dates (real formats, edge cases and
+random variations of both) and reports every value where they disagree:
+
+    python -m scripts.cleaner_check --random 5000
+
+The one intended difference: parse_date raises on "Денес"/"Вчера" without
+a valid time, where parse_date_series returns NaT. Exits with status 1 if
+any other output differs.
+"""
+import argparse
+import random
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .cleaner import MONTHS, parse_date, parse_date_series, parse_price, parse_price_series
+
+NOW = datetime(2025, 3, 14, 16, 20, 5, 123456)
+
+PRICES = [
+    "8 900 EUR", "8900EUR", "12 500 ЕУР", "450 000 MKD", "450000 мкд", "1 MKD", "0 EUR", "-5 EUR",
+    "По договор", "Цена на повик", "1", "999", "1000", "1001", "25 000", "", " ", None, 12500, 3.5,
+    "1_000 EUR", "1_000", "1__000 EUR", "_1000 EUR", "１２３ EUR", "١٢٣ EUR", "١٢٣٤٥", "²³ EUR", "²³",
+    "9486.405 EUR", "4549.355 EUR", "0.005 EUR", "1.2345 MKD", "1E3 EUR", "1e3eur", "123456E-5 EUR",
+    ".5 EUR", "5. EUR", "+7 EUR", "1,000 EUR", "1.000.000 MKD", "EUR", "MKD", "EURMKD 5", "5 EUR MKD",
+    "NaN EUR", "Infinity EUR", "inf MKD", "99999999.99 EUR", "100000000 EUR", "6149999999 MKD",
+    "100\tEUR", "100\nEUR", "\t100 EUR\t", "100\xa0EUR", "1 000 EUR", "1 0 0 0",
+]
+
+DATES = [
+    "Денес 14:30", "Вчера 09:15", "Денес 0:00", "Вчера 23:59", "Денес 7:5", "Денес 14:30 ч.",
+    "12 мар. 10:45", "1 јан. 00:00", "31 дек. 23:59", "3 мај 8:05", "29 фев. 10:00", "31 апр. 10:00",
+    "30 ноем. 12:00", "0 мар. 10:00", "32 мар. 10:00", "12 мар. 24:00", "12 мар. 10:60", "12 Мар. 10:45",
+    "12 march 10:45", "12 мар. 10:45 extra", "мар. 12 10:45", "12мар. 10:45", "  12  мар.  10:45  ",
+    "Денес 1_4:30", "Денес +14:30", "12 мар. +10:45", "+12 мар. 10:45", "1_2 мар. 10:45",
+    "Денес ١٤:٣٠", "١٢ мар. ١٠:٤٥", "１２ мар. 10:45", "12　мар.　10:45", "12\xa0мар. 10:45",
+    "12\x0bмар. 10:45", "12\x1cмар. 10:45", "Денес\x0b14:30", "Денесот 14:30", "ВчераX 10:10",
+    "Денес", "Вчера ", "Денес 25:00", "Денес 14:60", "Денес 14:30:15", "Денес abc", "Денес -1:30",
+    "Денес14:30 x", "14:30", "", "nan", None, np.nan, 20250314, "2025-03-14 10:00",
+]
+
+
+def random_prices(count: int, rng: random.Random) -> list:
+    def amount():
+        whole = rng.choice([rng.randint(0, 999), rng.randint(1000, 99999), rng.randint(100000, 9999999)])
+        if rng.random() < 0.3:
+            return f"{whole}.{rng.randint(0, 10 ** (d := rng.randint(1, 3)) - 1):0{d}d}"
+        return f"{whole:,}".replace(",", " ") if rng.random() < 0.5 else str(whole)
+
+    return [
+        rng.choice([f"{amount()} EUR", f"{amount()} MKD", f"{amount()} ЕУР", f"{amount()}EUR", amount(), "По договор"])
+        for _ in range(count)
+    ]
+
+
+def random_dates(count: int, rng: random.Random) -> list:
+    months = list(MONTHS)
+    return [
+        rng.choice([
+            f"{rng.choice(['Денес', 'Вчера'])} {rng.randint(0, 25)}:{rng.randint(0, 61):02d}",
+            f"{rng.randint(0, 32)} {rng.choice(months)} {rng.randint(0, 24)}:{rng.randint(0, 60):02d}",
+        ])
+        for _ in range(count)
+    ]
+
+
+def _same(expected, actual) -> bool:
+    if expected is None or pd.isna(actual):
+        return expected is None and pd.isna(actual)
+    if isinstance(expected, datetime):
+        return pd.Timestamp(expected) == actual
+    return float(expected) == float(actual)
+
+
+def compare(values: list, reference, vectorized) -> tuple[list, int]:
+    """(mismatches, intended differences) of `vectorized` against `reference` applied per value."""
+    actual = vectorized(pd.Series(values, dtype=object))
+    mismatches, intended = [], 0
+    for value, got in zip(values, actual):
+        try:
+            expected = reference(value)
+        except (IndexError, ValueError) as e:
+            # parse_date raises on "Денес"/"Вчера" without a valid time; NaT is intended
+            if pd.isna(got):
+                intended += 1
+            else:
+                mismatches.append((value, f"raised {type(e).__name__}", got))
+            continue
+        if not _same(expected, got):
+            mismatches.append((value, expected, got))
+    return mismatches, intended
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--random", type=int, default=5000, help="random prices and dates on top of the fixed sample")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    prices = PRICES + random_prices(args.random, rng)
+    dates = DATES + random_dates(args.random, rng)
+
+    ok = True
+    for name, values, reference, vectorized in [
+        ("prices", prices, parse_price, parse_price_series),
+        ("dates", dates, lambda d: parse_date(d, now=NOW), lambda s: parse_date_series(s, now=NOW)),
+    ]:
+        mismatches, intended = compare(values, reference, vectorized)
+        for value, expected, got in mismatches:
+            print(f"{name}: {value!r}: expected {expected!r}, got {got!r}")
+        note = f", {intended} NaT where the reference raises" if intended else ""
+        print(f"{name}: {len(values)} values, {len(mismatches)} mismatches{note}")
+        ok &= not mismatches
+    sys.exit(0 if ok else 1)
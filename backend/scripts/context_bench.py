@@ -0,0 +1,92 @@
+"""Compare prompt sizes (and optionally LLM prefill time) of the full and compact context formats.
+
+Builds both prompts for every query of the bench corpus over its top hits
+among synthetic cars, and reports prompt tokens per format. With
+--ollama-host it also sends each prompt to a real Ollama, generating a
+single token, and reports the prompt evaluation (prefill) time:
+
+    python -m scripts.context_bench
+    python -m scripts.context_bench --ollama-host http://127.0.0.1:11434 --runs 3
+
+--tokenizer picks the tokenizer as CONTEXT_TOKENIZER does (a tiktoken
+encoding name or a tokenizer.json path); without one, tokens are estimated.
+"""
+import argparse
+import statistics
+
+from scripts.bench import DEFAULT_CORPUS, load_corpus, synthetic_cars
+
+FORMATS = ["full", "compact"]
+
+
+def top_hits(cars: list[dict], params: dict, top_k: int) -> list[tuple]:
+    """Hits as (id, distance, metadata) items, matched on the corpus entry's /cars filters."""
+    def matches(car):
+        return all([
+            not params.get("make") or car["make"].lower() == params["make"].lower(),
+            not params.get("model") or car["model"].lower() == params["model"].lower(),
+            not params.get("city") or car["city"] == params["city"],
+            car["price_num"] >= params.get("price_min", 0),
+            car["price_num"] <= params.get("price_max", float("inf")),
+            car["year"] >= params.get("year_min", 0),
+            car["year"] <= params.get("year_max", 9999),
+            car["mileage_km"] <= params.get("mileage_max", float("inf")),
+        ])
+
+    hits = [car for car in cars if matches(car)] or cars
+    return [
+        (str(i), None, {**car, "date_posted": car["date_posted"].strftime("%d.%m.%Y")})
+        for i, car in enumerate(hits[:top_k])
+    ]
+
+
+def prefill_ms(client, model: str, prompt: str, runs: int) -> float:
+    durations = []
+    for _ in range(runs):
+        response = client.generate(model=model, prompt=prompt, options={"num_predict": 1})
+        durations.append(response["prompt_eval_duration"] / 1e6)
+    return statistics.median(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--tokenizer", default="cl100k_base")
+    parser.add_argument("--ollama-host", help="measure prefill time on this Ollama")
+    parser.add_argument("--model", default="llama3.2:1b")
+    parser.add_argument("--runs", type=int, default=3, help="generations per prompt (median)")
+    args = parser.parse_args()
+
+    from app.context import _load_counter, compact_context, full_context
+
+    count_tokens = _load_counter(args.tokenizer)
+    cars = synthetic_cars(2000)
+    builders = {
+        "full": full_context,
+        "compact": lambda query, items: compact_context(query, items, count_tokens=count_tokens),
+    }
+    client = None
+    if args.ollama_host:
+        from ollama import Client
+
+        client = Client(host=args.ollama_host)
+
+    tokens = {name: [] for name in FORMATS}
+    prefill = {name: [] for name in FORMATS}
+    for entry in load_corpus(args.corpus):
+        items = top_hits(cars, entry.get("params", {}), args.top_k)
+        for name in FORMATS:
+            prompt, _ = builders[name](entry["query"], items)
+            tokens[name].append(count_tokens(prompt))
+            if client:
+                prefill[name].append(prefill_ms(client, args.model, prompt, args.runs))
+
+    print(f"{len(tokens['full'])} queries, top {args.top_k} hits each")
+    for name in FORMATS:
+        line = f"{name:8} mean {statistics.mean(tokens[name]):6.0f} prompt tokens, max {max(tokens[name])}"
+        if client:
+            line += f", median prefill {statistics.median(prefill[name]):7.1f} ms"
+        print(line)
+    saved = 1 - statistics.mean(tokens["compact"]) / statistics.mean(tokens["full"])
+    print(f"compact prompts are {saved:.0%} shorter")
@@ -0,0 +1,151 @@
+"""End-to-end check of the crawler against scripts/listing_server.py.
+
+Serves the saved listing pages with every Nth request failing, starts a
+crawl in a subprocess, kills it once a few pages are checkpointed, then
+crawls again and checks that:
+
+- the second crawl resumes from the checkpoint instead of refetching
+  checkpointed pages,
+- the 503s were retried and every page was still parsed,
+- requests were never closer together than the rate limit allows,
+- together the two crawls yield exactly what parsing the saved pages gives.
+
+    python -m scripts.crawl_check
+    python -m scripts.crawl_check --pages-dir data/raw/pages --rate 2
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DEFAULT_PAGES = os.path.join(os.path.dirname(__file__), "..", "data", "fixtures", "pages")
+PARSER = "bs4"
+
+
+def crawl_worker(base_url: str, checkpoint_path: str, rate: float):
+    """Crawl to the end and print {page: cars} as the last line of output."""
+    import asyncio
+    from .crawler import crawl
+    from .parsers import PARSERS
+
+    async def collect():
+        return {page: cars async for page, cars in crawl(base_url, PARSERS[PARSER], max_pages=100, rate=rate,
+                                                         checkpoint_path=checkpoint_path, backoff=0.05)}
+
+    print(json.dumps(asyncio.run(collect()), ensure_ascii=False), flush=True)
+
+
+def expected_pages(pages_dir: str) -> dict[str, list[dict]]:
+    from .parsers import PARSERS
+
+    pages = {}
+    for path in glob.glob(os.path.join(pages_dir, "page_*.html")):
+        with open(path, "rb") as f:
+            pages[re.search(r"page_(\d+)\.html$", path).group(1)] = PARSERS[PARSER](f.read())
+    return pages
+
+
+def checkpointed_pages(path: str) -> set[int]:
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        # The last line may be cut short by the kill
+        lines = f.read().splitlines()
+    pages = set()
+    for line in lines:
+        try:
+            pages.add(json.loads(line)["page"])
+        except (ValueError, KeyError):
+            pass
+    return pages
+
+
+def start_crawl(base_url: str, checkpoint_path: str, rate: float) -> subprocess.Popen:
+    command = [sys.executable, "-m", "scripts.crawl_check", "--worker", base_url, checkpoint_path, "--rate", str(rate)]
+    return subprocess.Popen(command, stdout=subprocess.PIPE, text=True,
+                            cwd=os.path.join(os.path.dirname(__file__), ".."))
+
+
+def run(pages_dir: str, rate: float, fail_every: int, kill_after: int) -> list[str]:
+    """Failed checks, empty if all passed."""
+    from .listing_server import serve
+
+    expected = expected_pages(pages_dir)
+    if len(expected) <= kill_after:
+        return [f"need more than {kill_after} pages in {pages_dir}, found {len(expected)}"]
+    server = serve(pages_dir, port=0, fail_every=fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/"
+    failures = []
+
+    with tempfile.TemporaryDirectory() as workdir:
+        checkpoint_path = os.path.join(workdir, "checkpoint.jsonl")
+
+        print(f"Crawling {len(expected)} pages from {base_url}, killing it after {kill_after} pages")
+        first = start_crawl(base_url, checkpoint_path, rate)
+        while len(checkpointed_pages(checkpoint_path)) < kill_after and first.poll() is None:
+            time.sleep(0.01)
+        first.kill()
+        first.communicate()
+        if first.returncode == 0:
+            return ["the first crawl finished before it was killed; lower --rate"]
+        done = checkpointed_pages(checkpoint_path)
+        resumed_from = len(server.requests)
+        print(f"Killed with pages {sorted(done)} checkpointed, resuming")
+
+        second = start_crawl(base_url, checkpoint_path, rate)
+        output, _ = second.communicate(timeout=120)
+        if second.returncode != 0:
+            return [f"the resumed crawl failed with status {second.returncode}"]
+
+        if f"Resuming crawl: {len(done)} pages already in checkpoint" not in output:
+            failures.append("the second crawl did not resume from the checkpoint")
+        refetched = sorted({page for _, page, _ in server.requests[resumed_from:]} & done)
+        if refetched:
+            failures.append(f"checkpointed pages {refetched} were fetched again")
+        if json.loads(output.strip().splitlines()[-1]) != expected:
+            failures.append("the crawled cars differ from parsing the saved pages")
+        with open(checkpoint_path, encoding="utf-8") as f:
+            if json.loads(f.read().splitlines()[-1]) != {"finished": True}:
+                failures.append("the checkpoint was not closed after the crawl")
+
+    statuses = [status for _, _, status in server.requests]
+    if fail_every and 503 not in statuses:
+        failures.append("no request failed, so retries were not exercised")
+    times = [t for t, _, _ in server.requests]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    # The killed crawl's bucket and the new one's may overlap, so only gaps within each run count
+    gaps = gaps[:resumed_from - 1] + gaps[resumed_from:]
+    if gaps and min(gaps) < 0.5 / rate:  # server-side timestamps jitter by a few ms
+        failures.append(f"requests {min(gaps) * 1000:.0f} ms apart, the rate limit is {1000 / rate:.0f} ms")
+    server.shutdown()
+    print(f"{len(server.requests)} requests, {statuses.count(503)} answered 503 and retried, "
+          f"smallest gap {min(gaps) * 1000:.0f} ms")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages-dir", default=DEFAULT_PAGES)
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second")
+    parser.add_argument("--fail-every", type=int, default=3, help="answer every Nth request with a 503")
+    parser.add_argument("--kill-after", type=int, default=2, help="checkpointed pages before the crawl is killed")
+    parser.add_argument("--worker", nargs=2, metavar=("BASE_URL", "CHECKPOINT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        crawl_worker(*args.worker, rate=args.rate)
+        sys.exit(0)
+    failures = run(args.pages_dir, args.rate, args.fail_every, args.kill_after)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    print("crawl, retry and resume: " + ("FAILED" if failures else "OK"))
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+import httpx
+
+USER_AGENT = "collector-scraper/1.0"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second with bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: int = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Checkpoint:
+    """Append-only JSONL log of finished pages, so an interrupted crawl can resume.
+
+    Each line holds one page and its parsed cars. A final {"finished": true}
+    line closes the crawl, and the next run then starts from scratch. Only
+    the pages of an interrupted run are held in `pages`, for replay; pages
+    saved by this run go straight to the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pages: dict[int, list[dict]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            if entries and entries[-1].get("finished"):
+                entries = []
+                os.remove(path)
+            self.pages = {entry["page"]: entry["cars"] for entry in entries if "page" in entry}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def save(self, page: int, cars: list[dict]):
+        self._append({"page": page, "cars": cars})
+
+    def finish(self):
+        self._append({"finished": True})
+
+    def _append(self, entry: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def page_url(base_url: str, page: int) -> str:
+    return f"{base_url}?Page={page}" if page > 1 else base_url
+
+
+async def fetch(client: httpx.AsyncClient, url: str, bucket: TokenBucket,
+                retries: int = 4, backoff: float = 2.0) -> bytes:
+    """GET `url` through the rate limiter, retrying transient failures with exponential backoff."""
+    for attempt in range(retries + 1):
+        await bucket.acquire()
+        try:
+            res = await client.get(url)
+            if res.status_code not in RETRY_STATUSES:
+                res.raise_for_status()
+                return res.content
+            error = f"HTTP {res.status_code}"
+            retry_after = res.headers.get("Retry-After")
+        except httpx.TransportError as e:
+            error, retry_after = repr(e), None
+
+        if attempt == retries:
+            raise RuntimeError(f"Giving up on {url} after {retries + 1} attempts: {error}")
+        delay = float(retry_after) if retry_after and retry_after.isdigit() else backoff * 2 ** attempt
+        delay += random.uniform(0, backoff)
+        print(f"{url}: {error}, retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+async def crawl(base_url: str, parse, max_pages: int, rate: float, burst: int = 1,
+                concurrency: int = 2, checkpoint_path: str | None = None, timeout: float = 30.0,
+                save_dir: str | None = None, backoff: float = 2.0):
+    """Yield (page, cars) for listing pages 1..max_pages, in page order.
+
+    Pages are fetched over one pooled HTTP client, at most `concurrency` at a
+    time and no faster than the token bucket allows. Every parsed page is
+    checkpointed before it is yielded; pages already in the checkpoint are
+    replayed from it instead of being fetched again. The crawl stops at the
+    first page without listings. With `save_dir`, the raw HTML of every
+    fetched page is also kept as page_<n>.html (for parser benchmarks and
+    scripts/listing_server.py). `backoff` is the first retry delay in seconds.
+    """
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    done = checkpoint.pages if checkpoint else {}
+    if done:
+        print(f"Resuming crawl: {len(done)} pages already in checkpoint")
+    if save_dir:
+        os.makedirs(save_dir, exist_ok=True)
+    bucket = TokenBucket(rate, burst)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True,
+                                 headers={"User-Agent": USER_AGENT}) as client:
+        async def load(page: int) -> list[dict]:
+            if page in done:
+                return done.pop(page)  # replayed once, no need to keep it
+            print(f"Scraping page {page}...")
+            html = await fetch(client, page_url(base_url, page), bucket, backoff=backoff)
+            if save_dir:
+                with open(os.path.join(save_dir, f"page_{page}.html"), "wb") as f:
+                    f.write(html)
+            cars = parse(html)
+            if checkpoint:
+                checkpoint.save(page, cars)
+            return cars
+
+        # Keep up to `concurrency` pages in flight, but hand them out in order
+        tasks: dict[int, asyncio.Task] = {}
+        next_page = 1
+        try:
+            for page in range(1, max_pages + 1):
+                while next_page <= max_pages and len(tasks) < concurrency:
+                    tasks[next_page] = asyncio.create_task(load(next_page))
+                    next_page += 1
+                cars = await tasks.pop(page)
+                if not cars:
+                    print("No more listings found.")
+                    break
+                yield page, cars
+            else:
+                print(f"Reached MAX_PAGES ({max_pages}). Stopping.")
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    if checkpoint:
+        checkpoint.finish()
@@ -0,0 +1,137 @@
+"""Local stand-in for Ollama with configurable latency, for benchmarks.
+
+Implements the two endpoints the app uses: /api/embed returns deterministic
+hashed bag-of-words vectors (similar texts get similar vectors, so vector
+search still ranks sensibly), and /api/generate returns a canned answer,
+streamed as NDJSON when asked to:
+
+    python -m scripts.fake_ollama --port 11435 --embed-latency 0.02 --generate-latency 0.3
+    OLLAMA_HOST=http://127.0.0.1:11435 uvicorn app.main:app
+
+`--generate-latency` is the time to the first token, `--token-latency` the
+time between tokens after that. `--prefill-latency` adds time per prompt
+token (estimated at 4 characters each) before the first token, like a real
+model's prefill, so shorter prompts answer faster. `--parallel` caps how
+many generations run at once, like OLLAMA_NUM_PARALLEL; the rest queue.
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DIMENSIONS = 64
+ANSWER = "The best match is [1]: a well priced car with reasonable mileage for its year."
+
+
+def fake_embedding(text: str, dimensions: int = DIMENSIONS) -> list[float]:
+    vector = [0.0] * dimensions
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+        vector[int.from_bytes(digest[:4], "little") % dimensions] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def make_handler(embed_latency: float = 0.0, generate_latency: float = 0.0, token_latency: float = 0.0,
+                 tokens: int = 0, prefill_latency: float = 0.0, parallel: int = 0):
+    slots = threading.BoundedSemaphore(parallel) if parallel else None
+    words = ANSWER.split(" ")
+    if tokens:
+        words = (words * (tokens // len(words) + 1))[:tokens]
+    answer_tokens = [w + " " for w in words]
+
+    class OllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/api/embed":
+                self._embed(body)
+            elif self.path == "/api/generate":
+                if slots is None:
+                    self._generate(body)
+                else:
+                    with slots:
+                        self._generate(body)
+            else:
+                self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+
+        def _embed(self, body: dict):
+            texts = body.get("input") or []
+            if isinstance(texts, str):
+                texts = [texts]
+            time.sleep(embed_latency)
+            self._send_json(200, {
+                "model": body.get("model"),
+                "embeddings": [fake_embedding(text) for text in texts],
+                "prompt_eval_count": sum(len(text.split()) for text in texts),
+            })
+
+        def _generate(self, body: dict):
+            base = {"model": body.get("model"), "created_at": datetime.now(timezone.utc).isoformat()}
+            prompt_tokens = len(body.get("prompt", "")) // 4
+            final = {
+                **base, "response": "", "done": True, "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens, "eval_count": len(answer_tokens),
+            }
+            time.sleep(generate_latency + prefill_latency * prompt_tokens)
+            if not body.get("stream", True):
+                time.sleep(token_latency * (len(answer_tokens) - 1))
+                self._send_json(200, {**final, "response": "".join(answer_tokens)})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i, token in enumerate(answer_tokens):
+                if i:
+                    time.sleep(token_latency)
+                self._write_chunk({**base, "response": token, "done": False})
+            self._write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _write_chunk(self, data: dict):
+            line = json.dumps(data).encode() + b"\n"
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, data: dict):
+            payload = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return OllamaHandler
+
+
+def serve(port: int = 11435, **latencies) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(**latencies))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds per embed call")
+    parser.add_argument("--generate-latency", type=float, default=0.0, help="seconds to the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between tokens")
+    parser.add_argument("--prefill-latency", type=float, default=0.0, help="seconds per prompt token")
+    parser.add_argument("--tokens", type=int, default=0, help="answer length in tokens (default: the canned answer)")
+    parser.add_argument("--parallel", type=int, default=0, help="generations running at once (default: no limit)")
+    args = parser.parse_args()
+    print(f"Fake Ollama on http://127.0.0.1:{args.port}/")
+    serve(args.port, embed_latency=args.embed_latency, generate_latency=args.generate_latency,
+          token_latency=args.token_latency, tokens=args.tokens, prefill_latency=args.prefill_latency,
+          parallel=args.parallel).serve_forever()
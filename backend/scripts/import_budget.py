@@ -0,0 +1,89 @@
+"""Cold-start budget check for the API.
+
+Imports `app.main` (or --module) in fresh interpreters and fails if the
+median import time exceeds the budget, or if modules that must stay lazy
+(chromadb, which opens the vector store) were imported as a side effect:
+
+    python -m scripts.import_budget --budget 2.5 --runs 5
+
+Prints the slowest imports (from `python -X importtime`) to show where the
+time goes.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAZY_MODULES = ["chromadb"]
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [name for name in {lazy!r} if name in sys.modules],
+}}))
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # Importing must not need a live database or a writable cache directory
+    env.setdefault("POSTGRES_PORT", "5432")
+    env.setdefault("EMBEDDING_CACHE_PATH", "")
+    return env
+
+
+def probe(module: str) -> dict:
+    code = PROBE.format(module=module, lazy=LAZY_MODULES)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=_env(), check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[float, str]]:
+    """Direct imports of `module` by cumulative import time."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                         capture_output=True, text=True, env=_env(), check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested entries indented by two
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        if len(name) - len(name.lstrip()) == 3:
+            rows.append((int(parts[1]) / 1e6, name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget", type=float, default=2.5, help="seconds (median of --runs)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    results = [probe(args.module) for _ in range(args.runs)]
+    median = statistics.median(r["seconds"] for r in results)
+    rss = statistics.median(r["max_rss_mb"] for r in results)
+    loaded = sorted({name for r in results for name in r["loaded"]})
+
+    print(f"import {args.module}: median {median:.2f}s over {args.runs} runs (budget {args.budget:.2f}s), "
+          f"max RSS {rss:.0f} MB")
+    for seconds, name in slowest_imports(args.module, args.top):
+        print(f"  {seconds:6.3f}s  {name}")
+
+    failed = False
+    if median > args.budget:
+        print(f"FAIL: import takes {median:.2f}s, over the {args.budget:.2f}s budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: imported modules that must stay lazy: {', '.join(loaded)}")
+        failed = True
+    sys.exit(1 if failed else 0)
@@ -1,118 +1,128 @@
+import os
 import pandas as pd
+import numpy as np
 from datetime import datetime, timezone
-from decimal import Decimal, InvalidOperation
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.chroma_client import bump_generation
 from app.db.session import SessionLocal
 from app.models import Car
-import numpy as np
-
-def insert_cleaned_to_db(df=None, csv_path=None):
+from .snapshots import CLEANED_SCHEMA, latest_snapshots
+
+CHUNK_SIZE = 1000  # rows per INSERT round trip
+DEDUP_KEY = ['title', 'mileage_km', 'year']
+# Columns refreshed when an existing car is scraped again (on_conflict="update")
+UPDATE_COLUMNS = ['image_url', 'url', 'price_num', 'date_posted', 'make', 'model', 'city', 'municipality', 'scraped_at']
+
+def _to_int(series):
+    # Non-numeric values become NULL, fractional ones are truncated like int() did
+    return np.trunc(pd.to_numeric(series, errors='coerce')).astype('Int64')
+
+def _to_datetime(series):
+    # format='mixed' parses every value on its own, like the old per-row
+    # to_datetime; without it the first value's format is applied to the
+    # whole column and e.g. date-only values become NaT
+    dates = pd.to_datetime(series, errors='coerce', format='mixed')
+    lost = dates.isna() & series.notna() & (series.astype(str).str.strip() != '')
+    if lost.any():
+        print(f"Warning: {lost.sum()} unparseable dates stored as NULL, e.g. {series[lost].iloc[0]!r}")
+    return dates
+
+def prepare_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Map a cleaned DataFrame onto `cars` columns, column-wise instead of per row."""
+    def text(column):
+        if column not in df:
+            return pd.Series(None, index=df.index, dtype=object)
+        return df[column].replace({'': None})
+
+    rows = pd.DataFrame({
+        'image_url': text('image_url'),
+        'title': text('title'),
+        'url': text('url'),
+        'price_num': pd.to_numeric(df['price'], errors='coerce').round(2),
+        'year': _to_int(df['year']),
+        'mileage_km': _to_int(df['mileage']),
+        'date_posted': _to_datetime(df['date']),
+        'make': text('make'),
+        'model': text('model'),
+        'city': text('city'),
+        'municipality': text('municipality'),
+    })
+    rows['scraped_at'] = datetime.now(timezone.utc)
+    # One statement cannot touch the same key twice, so dedup the batch itself
+    return rows.drop_duplicates(subset=DEDUP_KEY, keep='last')
+
+def _records(rows: pd.DataFrame) -> list[dict]:
+    # Plain Python values with None for every kind of missing value
+    return rows.astype(object).where(rows.notna(), None).to_dict('records')
+
+def upsert_rows(session, rows: pd.DataFrame, on_conflict: str = "nothing", chunk_size: int = CHUNK_SIZE) -> list[int]:
+    """Insert rows in chunks with INSERT ... ON CONFLICT on the dedup key.
+
+    Returns the ids of inserted (and, with on_conflict="update", refreshed)
+    cars. Duplicate detection happens in Postgres against the unique index,
+    so the cost scales with the batch rather than with the table.
+    """
+    stmt = pg_insert(Car)
+    if on_conflict == "update":
+        stmt = stmt.on_conflict_do_update(
+            index_elements=DEDUP_KEY,
+            set_={column: stmt.excluded[column] for column in UPDATE_COLUMNS},
+        )
+    elif on_conflict == "nothing":
+        stmt = stmt.on_conflict_do_nothing(index_elements=DEDUP_KEY)
+    else:
+        raise ValueError(f"on_conflict must be 'nothing' or 'update', got {on_conflict!r}")
+    stmt = stmt.returning(Car.id)
+
+    ids = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = _records(rows.iloc[start:start + chunk_size])
+        # executemany + RETURNING is batched into multi-row VALUES by SQLAlchemy
+        ids.extend(session.execute(stmt, chunk).scalars().all())
+    return ids
+
+def insert_cleaned_to_db(df=None, csv_path=None, on_conflict="nothing", chunk_size=CHUNK_SIZE):
     """
     Insert cleaned cars into the database.
-    Either pass a DataFrame via `df` or a CSV path via `csv_path`.
-    Avoids duplicates based on title + mileage + year.
+    Either pass a DataFrame via `df` or a CSV path via `csv_path`
+    (a cleaned snapshot directory is read as its latest version of every car).
+    Avoids duplicates based on title + mileage + year, either skipping
+    known cars (on_conflict="nothing") or refreshing them ("update").
+    Returns the ids of the inserted/updated cars.
     """
-    if df is None and csv_path is not None:
+    if df is None and csv_path is not None and os.path.isdir(csv_path):
+        df = latest_snapshots(csv_path, CLEANED_SCHEMA)
+    elif df is None and csv_path is not None:
         # keep_default_na=False is important to read empty strings as ''
         df = pd.read_csv(csv_path, encoding='utf-8-sig', keep_default_na=False)
     elif df is None and csv_path is None:
         raise ValueError("You must provide either a DataFrame or a CSV path")
 
-    # Replace empty strings with None across the entire DataFrame
-    df = df.replace({'': None})
-    # Replace NaNs with None for SQLAlchemy
-    df = df.replace({np.nan: None})
-
-    def clean_date(val):
-        if pd.isna(val) or val is None:
-            return None
-        try:
-            date_val = pd.to_datetime(val, errors='coerce')
-            if pd.isna(date_val):
-                return None
-            return date_val
-        except Exception:
-            return None
-
-    df['date'] = df['date'].apply(clean_date)
-    # This line might be redundant now, but it's good practice apparently
-    df['date'] = df['date'].replace({pd.NaT: None})
-
+    rows = prepare_rows(df)
     session = SessionLocal()
-    cars_to_insert = []
+    ids = []
 
     try:
-        # Pre-fetch existing cars as tuples of (title, mileage, year)
-        existing_cars = set(
-            session.query(Car.title, Car.mileage_km, Car.year).all()
-        )
-
-        for _, row in df.iterrows():
-            year_raw = row.get('year')
-            mileage_raw = row.get('mileage')
-
-            year_value = None
-            if year_raw is not None:
-                try:
-                    year_value = int(year_raw)
-                except (ValueError, TypeError):
-                    year_value = None
-
-            mileage_value = None
-            if mileage_raw is not None:
-                try:
-                    mileage_value = int(mileage_raw)
-                except (ValueError, TypeError):
-                    mileage_value = None
-
-            price_raw = row.get('price')
-            price_value = None
-            if price_raw is not None:
-                try:
-                    price_value = Decimal(str(price_raw)).quantize(Decimal("0.01"))
-                except (InvalidOperation, ValueError):
-                    price_value = None
-
-            car_key = (
-                row.get('title', None),
-                mileage_value,
-                year_value
-            )
-            if car_key in existing_cars:
-                continue  # skip duplicates
-
-            car = Car(
-                image_url=row.get('image_url', None),
-                title=row.get('title', None),
-                url=row.get('url', None),
-                price_num=price_value,
-                year=year_value,  
-                mileage_km=mileage_value, 
-                date_posted=row['date'],
-                make=row.get('make', None),
-                model=row.get('model', None),
-                city=row.get('city', None),
-                municipality=row.get('municipality', None),
-                scraped_at=datetime.now(timezone.utc)
-            )
-            cars_to_insert.append(car)
-            existing_cars.add(car_key)
-
-        session.bulk_save_objects(cars_to_insert)
+        ids = upsert_rows(session, rows, on_conflict=on_conflict, chunk_size=chunk_size)
         session.commit()
-        print(f"Inserted {len(cars_to_insert)} new cars into the database.")
+        print(f"Inserted/updated {len(ids)} cars in the database.")
 
     except Exception as e:
         session.rollback()
+        ids = []
         print("Error inserting cars:", e)
     finally:
-        print(f"Processed {len(df)} rows; {len(cars_to_insert)} new cars added.")
+        print(f"Processed {len(df)} rows; {len(ids)} cars added or updated.")
         session.close()
+    if ids:
+        bump_generation()  # cached /search answers may quote the old rows
+    return ids
 
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
-        print("Usage: python insert_cars.py <csv_file>")
+        print("Usage: python insert_cars.py <csv_file | cleaned_snapshot_dir> [--update]")
         sys.exit(1)
 
     csv_file = sys.argv[1]
-    insert_cleaned_to_db(csv_path=csv_file)
\ No newline at end of file
+    insert_cleaned_to_db(csv_path=csv_file, on_conflict="update" if "--update" in sys.argv else "nothing")
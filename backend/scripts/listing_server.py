@@ -0,0 +1,75 @@
+"""Local stand-in for the listing site, serving saved listing pages.
+
+Serves <pages_dir>/page_<n>.html for `?Page=<n>` (page 1 without the
+parameter) and an empty page past the last saved one, so the crawler can be
+exercised end to end without touching the real site:
+
+    python -m scripts.listing_server data/fixtures/pages --port 8765
+    python -m scripts.scraper --base-url http://127.0.0.1:8765/ --crawl-delay 0.1
+
+data/fixtures/pages holds a few listing pages written in the site's markup.
+To serve real ones, capture them with `python -m scripts.scraper
+--max-pages 5 --save-pages DIR` and pass DIR instead.
+`--fail-every N` answers every Nth request with a 503 to exercise retries.
+`python -m scripts.crawl_check` crawls this server, kills the crawl partway
+and checks that it resumes from its checkpoint.
+"""
+import argparse
+import os
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+EMPTY_PAGE = b"<html><body><div class='no-results'></div></body></html>"
+
+
+def make_handler(pages_dir: str, fail_every: int = 0):
+    requests_seen = 0
+
+    class ListingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real site
+
+        def do_GET(self):
+            nonlocal requests_seen
+            requests_seen += 1
+            page = int(parse_qs(urlparse(self.path).query).get("Page", ["1"])[0])
+            failed = fail_every and requests_seen % fail_every == 0
+            self.server.requests.append((time.monotonic(), page, 503 if failed else 200))
+            if failed:
+                self._send(503, b"try again")
+                return
+            path = os.path.join(pages_dir, f"page_{page}.html")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self._send(200, f.read())
+            else:
+                self._send(200, EMPTY_PAGE)
+
+        def _send(self, status: int, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ListingHandler
+
+
+def serve(pages_dir: str, port: int = 8765, fail_every: int = 0) -> ThreadingHTTPServer:
+    """Server for `pages_dir`; `server.requests` logs (monotonic time, page, status) per request."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(pages_dir, fail_every))
+    server.requests = []
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages_dir")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+    print(f"Serving {args.pages_dir} on http://127.0.0.1:{args.port}/")
+    serve(args.pages_dir, args.port, args.fail_every).serve_forever()
@@ -0,0 +1,112 @@
+"""Golden comparison and micro-benchmark of the listing page parsers.
+
+Runs every parser in parsers.PARSERS over saved listing pages (page_*.html,
+as written by `scraper --save-pages DIR`), checks that each one returns
+exactly what the BeautifulSoup reference returns, and reports the parse
+time per page:
+
+    python -m scripts.parser_bench
+    python -m scripts.parser_bench data/raw/pages --golden data/raw/golden.json --repeat 20
+
+The reference output is also compared with (or, with `--update-golden`,
+written to) a golden JSON file, so a parser change that also alters the
+BeautifulSoup path does not go unnoticed. Without arguments, the pages in
+data/fixtures/pages are checked against data/fixtures/parser_golden.json.
+Exits with status 1 if any output differs.
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import sys
+import time
+from .parsers import PARSERS
+
+REFERENCE = "bs4"
+FIXTURES = os.path.normpath(os.path.join(os.path.dirname(__file__), "..", "data", "fixtures"))
+DEFAULT_PAGES = os.path.join(FIXTURES, "pages")
+DEFAULT_GOLDEN = os.path.join(FIXTURES, "parser_golden.json")
+
+def load_pages(pages_dir: str) -> dict[str, bytes]:
+    paths = sorted(glob.glob(os.path.join(pages_dir, "page_*.html")))
+    pages = {}
+    for path in paths:
+        with open(path, "rb") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+def first_difference(expected: list[dict], actual: list[dict]) -> str | None:
+    if len(expected) != len(actual):
+        return f"{len(actual)} rows instead of {len(expected)}"
+    for i, (want, got) in enumerate(zip(expected, actual)):
+        if want != got:
+            fields = [k for k in want.keys() | got.keys() if want.get(k) != got.get(k)]
+            return f"row {i}: " + ", ".join(f"{k}={got.get(k)!r} (expected {want.get(k)!r})" for k in sorted(fields))
+    return None
+
+def check(pages: dict[str, bytes], golden_path: str | None, update_golden: bool) -> bool:
+    reference = {name: PARSERS[REFERENCE](html) for name, html in pages.items()}
+    ok = True
+
+    if golden_path and update_golden:
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump(reference, f, ensure_ascii=False, indent=1)
+        print(f"Wrote golden output for {len(pages)} pages to {golden_path}")
+    elif golden_path:
+        with open(golden_path, encoding="utf-8") as f:
+            golden = json.load(f)
+        for name in pages.keys() | golden.keys():
+            diff = first_difference(golden.get(name, []), reference.get(name, []))
+            if diff:
+                ok = False
+                print(f"{REFERENCE} differs from golden on {name}: {diff}")
+
+    for parser_name, parse in PARSERS.items():
+        if parser_name == REFERENCE:
+            continue
+        for name, html in pages.items():
+            diff = first_difference(reference[name], parse(html))
+            if diff:
+                ok = False
+                print(f"{parser_name} differs from {REFERENCE} on {name}: {diff}")
+    return ok
+
+def bench(pages: dict[str, bytes], repeat: int) -> dict[str, float]:
+    """Median milliseconds to parse one page, per parser."""
+    results = {}
+    for parser_name, parse in PARSERS.items():
+        timings = []
+        for _ in range(repeat):
+            for html in pages.values():
+                started = time.perf_counter()
+                parse(html)
+                timings.append((time.perf_counter() - started) * 1000)
+        results[parser_name] = statistics.median(timings)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pages_dir", nargs="?", default=DEFAULT_PAGES)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--golden", metavar="FILE",
+                        help="golden JSON (default: the fixtures' golden file when checking the fixture pages)")
+    parser.add_argument("--update-golden", action="store_true")
+    args = parser.parse_args()
+    if args.golden is None and args.pages_dir == DEFAULT_PAGES:
+        args.golden = DEFAULT_GOLDEN
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        print(f"No page_*.html files in {args.pages_dir}")
+        sys.exit(1)
+
+    ok = check(pages, args.golden, args.update_golden)
+    rows = sum(len(PARSERS[REFERENCE](html)) for html in pages.values())
+    print(f"{len(pages)} pages, {rows} listings: {'all parsers agree' if ok else 'MISMATCH'}")
+
+    timings = bench(pages, args.repeat)
+    for parser_name, ms in timings.items():
+        speedup = timings[REFERENCE] / ms if ms else float("inf")
+        print(f"{parser_name:>5}: {ms:7.2f} ms/page  ({speedup:.1f}x vs {REFERENCE})")
+    sys.exit(0 if ok else 1)
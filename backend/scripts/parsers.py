@@ -0,0 +1,188 @@
+"""Listing page parsers.
+
+Both parsers extract the same fields from a listing page. The BeautifulSoup
+one is the reference; the lxml one walks the same tree with XPath
+expressions compiled once at import and is several times faster.
+`python -m scripts.parser_bench` checks that they agree on saved pages.
+"""
+from bs4 import BeautifulSoup
+from lxml import etree
+
+def _parse_year(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+def _parse_mileage(value):
+    if value and '-' in value:
+        parts = value.split('-')
+        try:
+            numbers = [float(p.replace(" ", "").strip()) for p in parts]
+            return int(round(sum(numbers) / len(numbers)))
+        except ValueError:
+            return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _location(link_texts: list[str]) -> dict:
+    """Map the breadcrumb links of a listing to make, model, city and municipality."""
+    if len(link_texts) >= 4 and link_texts[0] == 'Автомобили':
+        texts = link_texts[1:]
+    else:
+        texts = link_texts[2:]
+    return {
+        'make': texts[0] if len(texts) > 0 else None,
+        'model': texts[1] if len(texts) > 1 else None,
+        'city': texts[2] if len(texts) > 2 else None,
+        'municipality': texts[3] if len(texts) > 3 and texts[3] != 'Скопје' else None,
+    }
+
+# --- BeautifulSoup ---
+def parse_listing_page_bs4(html: bytes) -> list[dict]:
+    """Extract the car listings from one listing page with BeautifulSoup."""
+    soup = BeautifulSoup(html, 'lxml')
+    rows = soup.find_all('div', class_='row-listing')
+    cars = []
+
+    for row in rows:
+        car = {}
+
+        # Extract image URL
+        image = row.find('img', class_='ProductionImg')
+        car["image_url"] = image.get("data-src") or image.get("src") if image else None
+
+        # Extract title and URL
+        title = row.find('a', class_='Link_vis')
+        if title:
+            car["title"] = title.text.strip()
+            car["url"] = "https://www.pazar3.mk" + title.get("href")
+        else:
+            car["title"] = None
+            car["url"] = None
+
+        # Extract price
+        price = row.find('p', class_='list-price')
+        car["price"] = price.text.strip().replace("ЕУР", "EUR").replace("МКД", "MKD") if price else None
+        # Extract year and mileage
+        divs = row.find('div', class_='left-side').find_all('div')
+        year, mileage = None, None
+
+        for div in divs:
+            text = div.get_text(strip=True)
+            b_tag = div.find('b')
+            if not b_tag:
+                continue
+            value = b_tag.text.strip()
+            if 'Година' in text:
+                year = _parse_year(value)
+            elif 'Километража' in text:
+                mileage = _parse_mileage(value)
+        car["year"] = year
+        car["mileage"] = mileage
+
+        # Extract date, make, model, city, municipality
+        additional_info = row.find('div', class_='title')
+        if additional_info:
+            date = additional_info.find('span')
+            car["date"] = date.text.strip() if date else None
+            a_tags = additional_info.find_all('a', recursive=False)
+            car.update(_location([a.text.strip() for a in a_tags]))
+        else:
+            car["date"] = car["make"] = car["model"] = car["city"] = car["municipality"] = None
+
+        cars.append(car)
+    return cars
+
+# --- lxml XPath ---
+def _has_class(name: str) -> str:
+    # Same token match as BeautifulSoup's class_= filter
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Listing pages are served as UTF-8; BeautifulSoup detects that on its own
+_HTML_PARSER = etree.HTMLParser(encoding='utf-8')
+_ROWS = etree.XPath(f"//div[{_has_class('row-listing')}]")
+_IMAGE = etree.XPath(f"(.//img[{_has_class('ProductionImg')}])[1]")
+_TITLE = etree.XPath(f"(.//a[{_has_class('Link_vis')}])[1]")
+_PRICE = etree.XPath(f"(.//p[{_has_class('list-price')}])[1]")
+_LEFT_SIDE = etree.XPath(f"(.//div[{_has_class('left-side')}])[1]")
+_DIVS = etree.XPath(".//div")
+_BOLD = etree.XPath("(.//b)[1]")
+_INFO = etree.XPath(f"(.//div[{_has_class('title')}])[1]")
+_SPAN = etree.XPath("(.//span)[1]")
+_CHILD_LINKS = etree.XPath("./a")
+
+def _first(xpath, element):
+    found = xpath(element)
+    return found[0] if found else None
+
+def _text(element) -> str:
+    # Equivalent of Tag.text: every descendant string, comments excluded
+    return "".join(element.itertext())
+
+def _stripped_text(element) -> str:
+    # Equivalent of Tag.get_text(strip=True)
+    return "".join(s.strip() for s in element.itertext() if s.strip())
+
+def parse_listing_page_lxml(html: bytes) -> list[dict]:
+    """Extract the car listings from one listing page with precompiled XPath."""
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    root = etree.fromstring(html, _HTML_PARSER)
+    if root is None:
+        return []
+    cars = []
+
+    for row in _ROWS(root):
+        car = {}
+
+        image = _first(_IMAGE, row)
+        car["image_url"] = image.get("data-src") or image.get("src") if image is not None else None
+
+        title = _first(_TITLE, row)
+        if title is not None:
+            car["title"] = _text(title).strip()
+            car["url"] = "https://www.pazar3.mk" + title.get("href")
+        else:
+            car["title"] = None
+            car["url"] = None
+
+        price = _first(_PRICE, row)
+        car["price"] = _text(price).strip().replace("ЕУР", "EUR").replace("МКД", "MKD") if price is not None else None
+
+        left_side = _first(_LEFT_SIDE, row)
+        if left_side is None:
+            # The BeautifulSoup parser fails the whole page here as well
+            raise AttributeError("listing row without a 'left-side' block")
+        year, mileage = None, None
+        for div in _DIVS(left_side):
+            b_tag = _first(_BOLD, div)
+            if b_tag is None:
+                continue
+            text = _stripped_text(div)
+            value = _text(b_tag).strip()
+            if 'Година' in text:
+                year = _parse_year(value)
+            elif 'Километража' in text:
+                mileage = _parse_mileage(value)
+        car["year"] = year
+        car["mileage"] = mileage
+
+        info = _first(_INFO, row)
+        if info is not None:
+            date = _first(_SPAN, info)
+            car["date"] = _text(date).strip() if date is not None else None
+            car.update(_location([_text(a).strip() for a in _CHILD_LINKS(info)]))
+        else:
+            car["date"] = car["make"] = car["model"] = car["city"] = car["municipality"] = None
+
+        cars.append(car)
+    return cars
+
+PARSERS = {
+    "bs4": parse_listing_page_bs4,
+    "lxml": parse_listing_page_lxml,
+}
+DEFAULT_PARSER = "bs4"
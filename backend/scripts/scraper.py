@@ -1,129 +1,61 @@
 from datetime import datetime
-from bs4 import BeautifulSoup
-import requests
 import pandas as pd
-import json
-import time
+import asyncio
 import os
+from .crawler import crawl
+from .parsers import PARSERS, DEFAULT_PARSER
+from .snapshots import RAW_DATASET, RAW_SCHEMA, DEDUP_KEY, write_snapshot, import_csv
 BASE_URL = 'https://www.pazar3.mk/oglasi/vozila/avtomobili/prodazba'
 MAX_PAGES = 20
-CRAWL_DELAY = 20  # seconds
-
-def scrape_cars(max_pages=MAX_PAGES, crawl_delay=CRAWL_DELAY):
-    cars = []
-    page = 1
-
-    while True:
-        print(f'Scraping page {page}...')
-        url = f"{BASE_URL}?Page={page}" if page > 1 else BASE_URL
-        res = requests.get(url)
-        soup = BeautifulSoup(res.content, 'lxml')
-        rows = soup.find_all('div', class_='row-listing')
-
-        if not rows:
-            print('No more listings found.')
-            break
-
-        for row in rows:
-            car = {}
-
-            # Extract image URL
-            image = row.find('img', class_='ProductionImg')
-            car["image_url"] = image.get("data-src") or image.get("src") if image else None
-
-            # Extract title and URL
-            title = row.find('a', class_='Link_vis')
-            if title:
-                car["title"] = title.text.strip()
-                car["url"] = "https://www.pazar3.mk" + title.get("href")
-            else:
-                car["title"] = None
-                car["url"] = None
-
-            # Extract price
-            price = row.find('p', class_='list-price')
-            car["price"] = price.text.strip().replace("ЕУР", "EUR").replace("МКД", "MKD") if price else None
-            # Extract year and mileage
-            divs = row.find('div', class_='left-side').find_all('div')
-            year, mileage = None, None
-
-            for div in divs:
-                text = div.get_text(strip=True)
-                b_tag = div.find('b')
-                if not b_tag:
-                    continue
-                value = b_tag.text.strip()
-                if 'Година' in text:
-                    try:
-                        year = int(value)
-                    except (ValueError, TypeError):
-                        year = None
-                elif 'Километража' in text:
-                    if value and '-' in value:
-                        parts = value.split('-')
-                        try:
-                            numbers = [float(p.replace(" ", "").strip()) for p in parts]
-                            mileage = int(round(sum(numbers) / len(numbers)))
-                        except ValueError:
-                            mileage = None
-                    else:
-                        try:
-                            mileage = float(value)
-                        except ValueError:
-                            mileage = None
-            car["year"] = year
-            car["mileage"] = mileage
-
-            # Extract date, make, model, city, municipality
-            additional_info = row.find('div', class_='title')
-            if additional_info:
-                date = additional_info.find('span')
-                car["date"] = date.text.strip() if date else None
-
-                a_tags = additional_info.find_all('a', recursive=False)
-                if len(a_tags) >= 4 and a_tags[0].text.strip() == 'Автомобили':
-                    a_tags = a_tags[1:]
-                else:
-                    a_tags = a_tags[2:]
-
-                texts = [a.text.strip() for a in a_tags]
-                car['make'] = texts[0] if len(texts) > 0 else None
-                car['model'] = texts[1] if len(texts) > 1 else None
-                car['city'] = texts[2] if len(texts) > 2 else None
-                if len(texts) > 3:
-                    car['municipality'] = texts[3] if texts[3] != 'Скопје' else None
-                else:
-                    car['municipality'] = None
-            else:
-                car["date"] = car["make"] = car["model"] = car["city"] = car["municipality"] = None
-
-            cars.append(car)
-        page += 1
-        print(f"Waiting {crawl_delay} seconds to be polite...")
-        if page > MAX_PAGES:
-            print(f"Reached MAX_PAGES ({max_pages}). Stopping.")
-            break
-        time.sleep(crawl_delay)
-
-    os.makedirs("data", exist_ok=True)
-    os.makedirs("data/raw", exist_ok=True)
-    os.makedirs("data/cleaned", exist_ok=True)
-    df_existing = pd.read_csv('data/raw/cars.csv', encoding='utf-8-sig') if pd.io.common.file_exists('data/raw/cars.csv') else pd.DataFrame()
-    df_new = pd.DataFrame(cars)
+CRAWL_DELAY = 20  # seconds between requests, on average
+CONCURRENCY = 2  # pages in flight
+CHECKPOINT_PATH = 'data/raw/crawl_checkpoint.jsonl'
+LEGACY_CSV = 'data/raw/cars.csv'  # written by earlier versions, imported once
+
+def scrape_cars(max_pages=MAX_PAGES, crawl_delay=CRAWL_DELAY, base_url=BASE_URL,
+                concurrency=CONCURRENCY, checkpoint_path=CHECKPOINT_PATH,
+                parser=DEFAULT_PARSER, save_pages=None):
+    """Crawl listing pages and save them (see crawler.crawl for the engine).
+
+    Requests are rate limited to one per `crawl_delay` seconds on average,
+    and an interrupted crawl resumes from `checkpoint_path`. `parser` picks
+    the HTML parser from parsers.PARSERS. Returns only this run's cars;
+    latest_snapshots(RAW_DATASET, RAW_SCHEMA) gives the latest version of
+    every car seen so far.
+    """
+    async def collect():
+        cars = []
+        async for _, page_cars in crawl(base_url, PARSERS[parser], max_pages,
+                                        rate=1 / crawl_delay, concurrency=concurrency,
+                                        checkpoint_path=checkpoint_path, save_dir=save_pages):
+            cars.extend(page_cars)
+        return cars
+
+    cars = asyncio.run(collect())
+
+    if os.path.exists(LEGACY_CSV) and not os.path.exists(RAW_DATASET):
+        import_csv(LEGACY_CSV, RAW_DATASET, RAW_SCHEMA)
+
+    df_new = pd.DataFrame(cars, columns=RAW_SCHEMA.names[:-1])
     df_new['scraped_at'] = datetime.now()
+    df_new = df_new.drop_duplicates(subset=DEDUP_KEY, keep='first')
+    run = write_snapshot(df_new, RAW_DATASET, RAW_SCHEMA)
 
-    df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-    df_combined['scraped_at'] = pd.to_datetime(df_combined['scraped_at'], errors='coerce')
-    df_combined.sort_values('scraped_at', ascending=False, inplace=True)
-    df_cleaned = df_combined.drop_duplicates(subset=['title', 'year', 'mileage'], keep='first')
-    df_cleaned.to_csv('data/raw/cars.csv', index=False, encoding='utf-8-sig')
-
-    with open('data/raw/cars.json', 'w', encoding='utf-8') as f:
-        json.dump(cars, f, ensure_ascii=False, indent=4)
-
-    print(f"Scraping done. {len(cars)} cars saved to CSV and JSON at {datetime.now()}.")
+    print(f"Scraping done. {len(cars)} cars saved to {RAW_DATASET}/run={run} at {datetime.now()}.")
 
-    return df_cleaned  # return dataframe so it can be used by other scripts
+    # Only this run's rows, so the next stages don't re-clean the whole history
+    return df_new
 
 if __name__ == "__main__":
-    scrape_cars()
+    import argparse
+    parser = argparse.ArgumentParser(description="Scrape car listings")
+    parser.add_argument("--base-url", default=BASE_URL, help="listing URL, e.g. a local stand-in server")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES)
+    parser.add_argument("--crawl-delay", type=float, default=CRAWL_DELAY)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--parser", choices=sorted(PARSERS), default=DEFAULT_PARSER)
+    parser.add_argument("--save-pages", metavar="DIR", help="also keep the raw HTML of every fetched page")
+    args = parser.parse_args()
+    scrape_cars(max_pages=args.max_pages, crawl_delay=args.crawl_delay,
+                base_url=args.base_url, concurrency=args.concurrency,
+                parser=args.parser, save_pages=args.save_pages)
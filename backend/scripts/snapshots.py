@@ -0,0 +1,143 @@
+"""Columnar snapshot storage for scraped and cleaned listings.
+
+Every scrape (or clean) run is written as one Hive-style Parquet partition,
+e.g. data/raw/cars/run=20250101T120000/part-0.parquet. Writing a run never
+touches earlier partitions. Reads go through pyarrow.dataset, so only the
+requested columns are decoded, and filters (including on `run`) are pushed
+down to skip whole partitions and row groups.
+"""
+import os
+from datetime import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+RAW_DATASET = 'data/raw/cars'
+CLEANED_DATASET = 'data/cleaned/cars'
+DEDUP_KEY = ['title', 'year', 'mileage']
+
+RAW_SCHEMA = pa.schema([
+    ('image_url', pa.string()),
+    ('title', pa.string()),
+    ('url', pa.string()),
+    ('price', pa.string()),
+    ('year', pa.int64()),
+    ('mileage', pa.float64()),
+    ('date', pa.string()),
+    ('make', pa.string()),
+    ('model', pa.string()),
+    ('city', pa.string()),
+    ('municipality', pa.string()),
+    ('scraped_at', pa.timestamp('us')),
+])
+
+CLEANED_SCHEMA = pa.schema([
+    ('image_url', pa.string()),
+    ('title', pa.string()),
+    ('url', pa.string()),
+    ('price', pa.float64()),
+    ('year', pa.int64()),
+    ('mileage', pa.int64()),
+    ('date', pa.timestamp('us')),
+    ('make', pa.string()),
+    ('model', pa.string()),
+    ('city', pa.string()),
+    ('municipality', pa.string()),
+    ('scraped_at', pa.timestamp('us')),
+])
+
+PARTITIONING = ds.partitioning(pa.schema([('run', pa.string())]), flavor='hive')
+
+def new_run_id(now: datetime | None = None) -> str:
+    # Sorts chronologically, so `run` filters can select ranges of runs
+    return (now or datetime.now()).strftime('%Y%m%dT%H%M%S')
+
+def _table(df: pd.DataFrame, schema: pa.Schema) -> pa.Table:
+    df = df.reindex(columns=schema.names)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False, safe=False)
+
+def write_snapshot(df: pd.DataFrame, base_dir: str, schema: pa.Schema, run: str | None = None) -> str:
+    """Write `df` as the partition of run `run` and return the run id."""
+    run = run or new_run_id()
+    table = _table(df, schema).append_column('run', pa.array([run] * len(df), pa.string()))
+    ds.write_dataset(
+        table, base_dir, format='parquet', partitioning=PARTITIONING,
+        # Re-running with the same id replaces that run's file only
+        basename_template='part-{i}.parquet', existing_data_behavior='overwrite_or_ignore',
+    )
+    return run
+
+def dataset(base_dir: str, schema: pa.Schema) -> ds.Dataset | None:
+    if not os.path.isdir(base_dir):
+        return None
+    return ds.dataset(base_dir, schema=schema.append(pa.field('run', pa.string())),
+                      format='parquet', partitioning=PARTITIONING)
+
+def read_snapshots(base_dir: str, schema: pa.Schema, columns=None, filter=None) -> pd.DataFrame:
+    """Read snapshot rows as a DataFrame, decoding only `columns` and rows matching `filter`.
+
+    `filter` is a pyarrow.dataset expression, e.g. ds.field('run') >= '20250101'.
+    """
+    data = dataset(base_dir, schema)
+    if data is None:
+        schema = schema.append(pa.field('run', pa.string()))
+        return pa.schema([f for f in schema if columns is None or f.name in columns]).empty_table().to_pandas()
+    return data.to_table(columns=columns, filter=filter).to_pandas()
+
+def _key_columns(table: pa.Table) -> dict[str, pa.Array]:
+    # Arrow joins never match nulls, while drop_duplicates treats them as equal
+    return {
+        '_title': pc.fill_null(table['title'], ''),
+        '_year': pc.fill_null(table['year'], -1),
+        '_mileage': pc.fill_null(table['mileage'], -1),
+    }
+
+def latest_snapshots(base_dir: str, schema: pa.Schema, columns=None, filter=None) -> pd.DataFrame:
+    """Latest version of every car across runs, by title + year + mileage.
+
+    Latest means the highest `scraped_at`. The key and timestamp columns are
+    aggregated in Arrow and joined back to the selected rows.
+    """
+    data = dataset(base_dir, schema)
+    if data is None:
+        return read_snapshots(base_dir, schema, columns=columns)
+    names = columns or schema.names
+    needed = list(dict.fromkeys([*names, *DEDUP_KEY, 'scraped_at']))
+    table = data.to_table(columns=needed, filter=filter)
+    for name, column in _key_columns(table).items():
+        table = table.append_column(name, column)
+
+    key = list(_key_columns(table))
+    latest = table.select([*key, 'scraped_at']).group_by(key).aggregate([('scraped_at', 'max')])
+    latest = latest.rename_columns([*key, '_latest'])
+    table = table.join(latest, key, join_type='inner')
+    table = table.filter(pc.equal(table['scraped_at'], table['_latest']))
+    # Several rows of one run with the same key: keep one, like drop_duplicates
+    table = table.group_by(key, use_threads=False).aggregate([(name, 'first') for name in names])
+    return table.rename_columns([
+        name.removesuffix('_first') for name in table.column_names
+    ]).select(names).to_pandas()
+
+def import_csv(csv_path: str, base_dir: str, schema: pa.Schema, run: str | None = None):
+    """Turn a CSV written by earlier versions of the scripts into one snapshot partition."""
+    run = run or new_run_id(datetime.fromtimestamp(os.path.getmtime(csv_path)))
+    df = pd.read_csv(csv_path, encoding='utf-8-sig')
+    for name in schema.names:
+        if name in df and pa.types.is_timestamp(schema.field(name).type):
+            df[name] = pd.to_datetime(df[name], errors='coerce')
+    write_snapshot(df, base_dir, schema, run=run)
+    print(f"Imported {len(df)} rows from {csv_path} into {base_dir} as run={run}.")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Inspect or import car snapshots")
+    parser.add_argument("kind", choices=["raw", "cleaned"])
+    parser.add_argument("--import-csv", metavar="CSV", help="import a CSV from an earlier run")
+    args = parser.parse_args()
+
+    base_dir, schema = (RAW_DATASET, RAW_SCHEMA) if args.kind == "raw" else (CLEANED_DATASET, CLEANED_SCHEMA)
+    if args.import_csv:
+        import_csv(args.import_csv, base_dir, schema)
+    runs = read_snapshots(base_dir, schema, columns=['run'])
+    print(runs['run'].value_counts().sort_index().to_string() if len(runs) else "No snapshots yet.")